@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+"""
+Program: Benchmark for the 95% Confidence Interval of a Proportion Simulation
+Author: Nathan Fox <nchristopherfox@gmail.com>
+Date Created: 2026-10-19
+Date Modified: 2026-10-19
+
+This program times conf_int_proportion_sim.simulate() for every method in
+conf_int_proportion_sim.METHODS across a matrix of simulation counts (n) and
+sample sizes (s). For each combination it reports simulations per second,
+peak memory, and how the run time splits between drawing random numbers,
+computing the confidence intervals and reducing them to coverage flags.
+
+It also checks that every fast method agrees with the reference 'loop'
+method: their coverage proportions must be within Monte Carlo error of each
+other. Results can be written to a JSON file for regression tracking. To see
+command line arguments, run 'python conf_int_proportion_bench.py -h'.
+"""
+
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+import numpy as np
+
+import conf_int_proportion_sim as cips
+
+def time_method(x, n, sample_size, method, seed, repeats):
+    """Benchmark one method on one (n, sample_size) combination.
+
+    Args:
+        x: float; population proportion for favorable outcome
+        n: integer; number of simulations
+        sample_size: integer; number of trials per simulation
+        method: string; name of a method in conf_int_proportion_sim.METHODS
+        seed: integer; seed for the random number generator
+        repeats: integer; number of timed runs, the fastest is reported
+
+    Returns:
+        A dict with the best wall time, simulations per second, peak traced
+        memory in bytes, the per-phase time split and the coverage
+        proportion of the last run.
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = cips.simulate(x, n, sample_size, seed=seed, method=method)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    cips.simulate(x, n, sample_size, seed=seed, method=method)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The method itself, with its optional phase timers switched on.
+    phases = {'rng': 0.0, 'interval': 0.0, 'reduction': 0.0}
+    cips.METHODS[method](x, n, sample_size, np.random.default_rng(seed),
+                         phases=phases)
+    return {
+        'method': method,
+        'n': n,
+        'sample_size': sample_size,
+        'seconds': best,
+        'sims_per_second': n / best if best > 0 else float('inf'),
+        'peak_memory_bytes': peak,
+        'phases': phases,
+        'coverage': float(results[:, 2].mean()),
+    }
+
+def check_agreement(x, n, sample_size, method, seed, z=4.0):
+    """Check a method against the reference 'loop' method.
+
+    The two coverage proportions come from independent random streams, so
+    they are compared with a two-sample test: they agree if they differ by
+    less than z standard errors of the difference.
+
+    Returns:
+        A dict with both coverage proportions, the allowed tolerance and
+        whether the method agrees with the reference.
+    """
+    ref = cips.simulate(x, n, sample_size, seed=seed, method='loop')[:, 2]
+    fast = cips.simulate(x, n, sample_size, seed=seed, method=method)[:, 2]
+    p_ref = ref.mean()
+    p_fast = fast.mean()
+    p_pool = (p_ref + p_fast) / 2
+    # Floor the variance so that coverage of exactly 0 or 1 still gets a
+    # tolerance of about one simulation.
+    var = max(p_pool * (1 - p_pool), 1 / n)
+    tolerance = z * np.sqrt(var * 2 / n)
+    return {
+        'method': method,
+        'reference_coverage': float(p_ref),
+        'coverage': float(p_fast),
+        'tolerance': float(tolerance),
+        'agrees': bool(abs(p_ref - p_fast) <= tolerance),
+    }
+
+def main():
+    """Benchmark simulate() and print a table of the results.
+
+    Exits with a non-zero status if any fast method disagrees with the
+    reference loop.
+    """
+    parser = argparse.ArgumentParser(description=('Benchmarks the 95% '
+                                        'Confidence Interval simulation '
+                                        'across a matrix of n and sample '
+                                        'sizes.'))
+    parser.add_argument('-P', default=0.3, type=float,
+                        help='Proportion of population with favorable outcome')
+    parser.add_argument('-n', default=[1000, 10000, 100000], type=int,
+                        nargs='+', help='Numbers of simulations to time')
+    parser.add_argument('-s', default=[10, 40, 400], type=int, nargs='+',
+                        help='Sample sizes to time')
+    parser.add_argument('--methods', default=sorted(cips.METHODS), nargs='+',
+                        choices=sorted(cips.METHODS),
+                        help='Methods to benchmark')
+    parser.add_argument('--seed', default=0, type=int,
+                        help='Seed for the random number generator')
+    parser.add_argument('--repeats', default=3, type=int,
+                        help='Number of timed runs per combination')
+    parser.add_argument('--check-n', default=20000, type=int,
+                        help=('Number of simulations used to check fast '
+                              'methods against the reference loop'))
+    parser.add_argument('--json', default=None,
+                        help='Write the results to this JSON file')
+
+    args = parser.parse_args()
+    timings = []
+    print('\n{:<12}{:>10}{:>8}{:>14}{:>12}{:>8}{:>10}{:>8}'.format(
+          'method', 'n', 's', 'sims/s', 'peak KiB', 'rng%', 'interval%',
+          'red%'))
+    print('-' * 82)
+    for n in args.n:
+        for s in args.s:
+            for method in args.methods:
+                t = time_method(args.P, n, s, method, args.seed, args.repeats)
+                timings.append(t)
+                total = sum(t['phases'].values()) or 1.0
+                print('{:<12}{:>10}{:>8}{:>14.0f}{:>12.1f}{:>8.1f}{:>10.1f}'
+                      '{:>8.1f}'.format(method, n, s, t['sims_per_second'],
+                                        t['peak_memory_bytes'] / 1024,
+                                        100 * t['phases']['rng'] / total,
+                                        100 * t['phases']['interval'] / total,
+                                        100 * t['phases']['reduction'] / total))
+
+    checks = []
+    print('\nAgreement with reference loop (n = {})'.format(args.check_n))
+    print('-' * 82)
+    for s in args.s:
+        for method in args.methods:
+            if method == 'loop':
+                continue
+            c = check_agreement(args.P, args.check_n, s, method, args.seed)
+            c['sample_size'] = s
+            checks.append(c)
+            print('{:<12} s={:<6} loop={:.4f} {}={:.4f} tol={:.4f} {}'.format(
+                  method, s, c['reference_coverage'], method, c['coverage'],
+                  c['tolerance'], 'OK' if c['agrees'] else 'MISMATCH'))
+    print()
+
+    if args.json is not None:
+        report = {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'P': args.P,
+            'seed': args.seed,
+            'timings': timings,
+            'agreement': checks,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if not all(c['agrees'] for c in checks):
+        raise SystemExit(1)
+
+if __name__=='__main__':
+    main()
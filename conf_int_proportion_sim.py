@@ -3,7 +3,7 @@
 Program: 95% Confidence Interval of a Proportion Simulation
 Author: Nathan Fox <nchristopherfox@gmail.com>
 Date Created: 2019-05-28
-Date Modified: 2019-05-28
+Date Modified: 2026-10-19
 
 This program conducts a simulation to confirm the modified Wald's method
 for calculating a 95% Confidence Interval (CI) for a proportion. It takes a
@@ -13,9 +13,17 @@ the population proportion parameter.
 
 Modified Wald's Method for 95% CI for a Proportion was taken from pg 39 of
 Intuitive Biostatistics by Harvey Motulsky, ISBN-13 978-0-19-064356-0
+
+Seeded results can be memoized in an on-disk cache (see ResultCache), so
+repeated runs with the same parameters return instantly and sweep() only
+computes the grid cells that are missing.
 """
 
 import argparse
+import hashlib
+import json
+import os
+import time
 import numpy as np
 
 def mod_wald(successes, trials):
@@ -41,7 +49,66 @@ def mod_wald(successes, trials):
     w = 2 * np.sqrt((p_hat * (1-p_hat)) / (trials + 4))
     return (p_hat-w, p_hat+w)
 
-def simulate(x, n, sample_size):
+def _add_phase(phases, name, start):
+    """Add the time since start to phases[name]; return the current time."""
+    now = time.perf_counter()
+    phases[name] = phases.get(name, 0.0) + now - start
+    return now
+
+def _simulate_loop(x, n, sample_size, rng, phases=None):
+    """Reference implementation of simulate(), one simulation at a time.
+
+    If phases is a dict, the time spent drawing random numbers, computing
+    intervals and reducing them to coverage flags is added to its 'rng',
+    'interval' and 'reduction' entries.
+    """
+    results = np.zeros((n, 3))
+    for i in range(n):
+        if phases is not None:
+            t = time.perf_counter()
+        s = rng.uniform(size=sample_size)
+        s = s < x
+        if phases is not None:
+            t = _add_phase(phases, 'rng', t)
+        results[i] = (mod_wald(successes=s.sum(), trials=sample_size) + (-1.0,))
+        if phases is not None:
+            t = _add_phase(phases, 'interval', t)
+        results[i, 2] = float((results[i, 0] <= x) and (results[i, 1] >= x))
+        if phases is not None:
+            _add_phase(phases, 'reduction', t)
+    return results
+
+def _simulate_vectorized(x, n, sample_size, rng, phases=None):
+    """Vectorized simulate(), drawing every success count at once.
+
+    The number of successes in sample_size Bernoulli(x) trials is drawn
+    directly from the equivalent binomial distribution, so memory use is
+    O(n) rather than O(n * sample_size). phases works as in _simulate_loop.
+    """
+    if phases is not None:
+        t = time.perf_counter()
+    successes = rng.binomial(sample_size, x, size=n)
+    if phases is not None:
+        t = _add_phase(phases, 'rng', t)
+    lower, upper = mod_wald(successes=successes, trials=sample_size)
+    if phases is not None:
+        t = _add_phase(phases, 'interval', t)
+    results = np.empty((n, 3))
+    results[:, 0] = lower
+    results[:, 1] = upper
+    results[:, 2] = (lower <= x) & (upper >= x)
+    if phases is not None:
+        _add_phase(phases, 'reduction', t)
+    return results
+
+# Maps the method names accepted by simulate() to their implementations.
+# Each takes (x, n, sample_size, rng, phases=None).
+METHODS = {
+    'loop': _simulate_loop,
+    'vectorized': _simulate_vectorized,
+}
+
+def simulate(x, n, sample_size, seed=None, method='loop', cache=None):
     """Simulate calculation of 95% CI for proportions from binomial data.
 
     Simulates n experiments, drawing sample_size data points from a distribution
@@ -53,6 +120,11 @@ def simulate(x, n, sample_size):
         x: float; population proportion for favorable outcome
         n: integer; number of simulations
         sample_size: integer; number of trials per simulation
+        seed: integer or None; seed for the random number generator. Results
+            are only reproducible (and only cached) when a seed is given.
+        method: string; name of the implementation to use, one of METHODS
+        cache: ResultCache or None; if given, seeded results are looked up
+            in and stored to this cache
 
     Returns:
         Numpy array of size(n, 3). Each row is a simulation.
@@ -62,14 +134,126 @@ def simulate(x, n, sample_size):
     """
     if x > 1.0 or x < 0.0:
         raise ValueError('x must be in the closed interval [0, 1]!')
-    results = np.zeros((n, 3))
-    for i in range(n):
-        s = np.random.uniform(size=sample_size)
-        s = s < x
-        results[i] = (mod_wald(successes=s.sum(), trials=sample_size) + (-1.0,))
-        results[i, 2] = float((results[i, 0] <= x) and (results[i, 1] >= x))
+    if method not in METHODS:
+        raise ValueError('method must be one of: {}'.format(
+                         ', '.join(sorted(METHODS))))
+    use_cache = cache is not None and seed is not None
+    if use_cache:
+        results = cache.get(x, n, sample_size, seed, method)
+        if results is not None:
+            return results
+    rng = np.random.default_rng(seed)
+    results = METHODS[method](x, n, sample_size, rng)
+    if use_cache:
+        cache.put(x, n, sample_size, seed, method, results)
+    return results
+
+def sweep(xs, ns, sample_sizes, seed, method='loop', cache=None):
+    """Run simulate() over every combination of the given parameters.
+
+    With a cache, only the grid cells that have not been computed before are
+    simulated; the rest are read back from disk.
+
+    Args:
+        xs: iterable of floats; population proportions
+        ns: iterable of integers; numbers of simulations
+        sample_sizes: iterable of integers; numbers of trials per simulation
+        seed: integer; seed shared by every grid cell
+        method: string; name of the implementation to use, one of METHODS
+        cache: ResultCache or None
+
+    Returns:
+        A dict mapping (x, n, sample_size) tuples to the simulate() result
+        for that grid cell.
+    """
+    results = {}
+    for x in xs:
+        for n in ns:
+            for sample_size in sample_sizes:
+                results[(x, n, sample_size)] = simulate(
+                        x, n, sample_size, seed=seed, method=method,
+                        cache=cache)
     return results
 
+class ResultCache:
+    """Size-bounded, least-recently-used on-disk cache of simulate() results.
+
+    Each result is stored as its own .npy file in cache_dir, named by a hash
+    of its parameters, method and seed. A cache hit refreshes the file's
+    modification time, and when the total size of the cache grows past
+    max_bytes the least recently used files are deleted first.
+
+    Attributes:
+        cache_dir: string; directory holding the cached results
+        max_bytes: integer; upper bound on the total size of the cache
+        hits: integer; number of lookups answered from the cache
+        misses: integer; number of lookups that had to be computed
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        if max_bytes <= 0:
+            raise ValueError('max_bytes must be positive!')
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, x, n, sample_size, seed, method):
+        key = json.dumps([float(x), int(n), int(sample_size), int(seed),
+                          method])
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.npy')
+
+    def get(self, x, n, sample_size, seed, method):
+        """Return the cached result, or None (and count a miss) if absent."""
+        path = self._path(x, n, sample_size, seed, method)
+        try:
+            results = np.load(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return results
+
+    def put(self, x, n, sample_size, seed, method, results):
+        """Store a result, then evict old entries until under max_bytes."""
+        path = self._path(x, n, sample_size, seed, method)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, results)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.npy'):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        """Delete every cached result and reset the hit/miss counters."""
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npy'):
+                os.remove(entry.path)
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return a dict with the hit and miss counts of this cache."""
+        return {'hits': self.hits, 'misses': self.misses}
+
 def main():
     """Simulation to verify 95% Confidence Interval for Proportion.
 
@@ -89,14 +273,31 @@ def main():
     parser.add_argument('-s', default=40, type=int,
                         help=('Number of trials in each simulation '
                               '(sample size)'))
+    parser.add_argument('--seed', default=None, type=int,
+                        help='Seed for the random number generator')
+    parser.add_argument('--method', default='loop', choices=sorted(METHODS),
+                        help='Simulation implementation to use')
+    parser.add_argument('--cache-dir', default=None,
+                        help=('Directory for an on-disk cache of seeded '
+                              'results'))
+    parser.add_argument('--cache-max-mb', default=256, type=float,
+                        help='Maximum size of the result cache in MB')
 
     args=parser.parse_args()
-    results = simulate(x=args.P, n=args.n, sample_size=args.s)
+    cache = None
+    if args.cache_dir is not None:
+        cache = ResultCache(args.cache_dir,
+                            max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    results = simulate(x=args.P, n=args.n, sample_size=args.s,
+                       seed=args.seed, method=args.method, cache=cache)
     print('\nResults\n====================\n')
     # print(results)
     print('# of Simulations:           {}'.format(args.n))
     print('# of CIs Including True P:  {}'.format(int(results[:,2].sum())))
     print('% of Sims Including True P: {}'.format(results[:,2].sum()/args.n))
+    if cache is not None:
+        print('Cache hits / misses:        {} / {}'.format(cache.hits,
+                                                          cache.misses))
     print()
 
 if __name__=='__main__':
@@ -3,6 +3,7 @@
 import matplotlib as mpl
 mpl.use('TkAgg')
 
+import argparse
 import time
 
 import numpy as np
@@ -11,56 +12,179 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import tkinter as Tk
 
 import snake_classes
+import snake_render
+import snake_stats
+import snake_timing
+import snake_trap
 
 # Hacky global variables (shame on you)
 root = None
 reset_button = None
-snake = None
+board = None
+snakes = []
+renderers = []
+layer = None
 ax = None
 canvas = None
+background = None
 trapped_msg = None
+detectors = []
+doom_msg = None
+timer = None
+timing_overlay = None
+TIMING_LOG = None
+EARLY_WARNING = False
+TICK_MS = 250
+ADAPTIVE = False
+BOARD_SIZE = (30, 30)
+SNAKE_COUNT = 1
+SNAKE_LENGTH = 16
+BODY_COLORS = ('viridis', 'plasma', 'cividis', 'cool', 'spring', 'summer',
+               'autumn', 'winter', 'magma', 'Wistia')
+PLACEMENT_TRIES = 1000
 
-def make_snake(body_color = 'viridis'):
-    global snake
-    snake = snake_classes.Snake((int(((ax.get_xlim()[1] - ax.get_xlim()[0]) / 2)) + 4,
-                                 int(((ax.get_ylim()[1] - ax.get_ylim()[0]) / 2))),
-                                'right', 16, label='snake1')
-    snake.set_body_color(body_color)
-    return(snake)
-
-def update_canvas():
-    global snake
-    global ax
-    global canvas
-    directions = ('up', 'down', 'left', 'right')
-    dir_choices = list(directions)
-    new_dir = None
-    for i in range(len(dir_choices)):
-        # Type conversion is because validation functions are expecting
-        # a str type not a numpy.str_ type
-        new_dir = str(np.random.choice(dir_choices))
-        new_head_pos = snake.get_new_head_pos(new_dir)
-        if (ax.get_xlim()[0] ==  new_head_pos[0]
-                or ax.get_xlim()[1] + 1 == new_head_pos[0]
-                or ax.get_ylim()[0] == new_head_pos[1]
-                or ax.get_ylim()[1] + 1 == new_head_pos[1]):
-            dir_choices.remove(new_dir)
-            new_dir = None
-            continue
+def make_snakes(count=None, length=None):
+    # Puts count snakes on a new shared board. The first one starts at the
+    # usual spot right of center, facing right; the others are dropped at
+    # random places and headings where they don't overlap anything.
+    global board
+    global snakes
+    global detectors
+    count = SNAKE_COUNT if count is None else count
+    length = SNAKE_LENGTH if length is None else length
+    board = snake_classes.Board(BOARD_SIZE)
+    snakes = []
+    head = snake_stats.start_position(BOARD_SIZE, length)
+    direction = 'right'
+    tries = 0
+    while len(snakes) < count:
+        i = len(snakes)
+        snake = snake_classes.Snake(head, direction, length,
+                                    label='snake{}'.format(i + 1))
         try:
-            snake.move_snake_one(new_dir)
-            break
+            board.add_snake(snake)
         except ValueError:
-            dir_choices.remove(new_dir)
-            new_dir = None
-            continue
-    if new_dir is None:
+            tries += 1
+            if tries > PLACEMENT_TRIES:
+                raise ValueError('couldn\'t fit {} snakes of length {} on a '
+                                 '{}x{} board!'.format(count, length,
+                                                       *BOARD_SIZE)) from None
+        else:
+            snake.set_body_color(BODY_COLORS[i % len(BODY_COLORS)])
+            snakes.append(snake)
+        head = (np.random.randint(1, BOARD_SIZE[0] + 1),
+                np.random.randint(1, BOARD_SIZE[1] + 1))
+        direction = str(np.random.choice(snake_stats.DIRECTIONS))
+    detectors = []
+    if EARLY_WARNING:
+        detectors = [snake_trap.TrapDetector(snake, BOARD_SIZE, board)
+                     for snake in snakes]
+    return(snakes)
+
+def doom_text():
+    # Early warning from the trap detectors, shown at the bottom.
+    doomed = [(snake, detector) for snake, detector in zip(snakes, detectors)
+              if detector.doomed]
+    if not doomed:
+        return('')
+    if len(snakes) == 1:
+        snake, detector = doomed[0]
+        left = detector.trapped_by - snake.moves
+        if left <= 0:
+            return('No way out')
+        return('Trapped within {} move{}'.format(left,
+                                                 's' if left > 1 else ''))
+    return('{} of {} snakes are certain to be trapped'.format(len(doomed),
+                                                              len(snakes)))
+
+def update_canvas():
+    # One tick: every snake that has a free cell next to its head moves
+    # into one at random. The board's index makes each check O(1), and only
+    # the renderers of snakes that moved are updated. A snake that is
+    # boxed in waits, since others may move out of its way; the game ends
+    # when no snake can move. With EARLY_WARNING, the trap detectors of the
+    # snakes that moved are updated too, to warn as soon as a trap is
+    # certain.
+    #
+    # With timing on, each phase is timed and the overlay shows the recent
+    # averages. With ADAPTIVE, the delay to the next tick is whatever is
+    # left of TICK_MS after this tick's work, so the tick rate holds.
+    if timer is not None:
+        timer.start()
+    elif ADAPTIVE:
+        start = time.perf_counter()
+    moved = []
+    for i, snake in enumerate(snakes):
+        choices = board.free_directions(snake)
+        if choices:
+            board.move_snake(snake, choices[np.random.randint(len(choices))])
+            moved.append(i)
+    if timer is not None:
+        timer.mark('move')
+    if detectors:
+        for i in moved:
+            detectors[i].update()
+        doom_msg.set_text(doom_text() if moved else '')
+        if timer is not None:
+            timer.mark('detect')
+    # Same order as the moves, so a cell vacated by one snake and taken by
+    # a later one ends up painted by the later one.
+    for i in moved:
+        renderers[i].update()
+    if timer is not None:
+        timer.mark('render')
+        timing_overlay.set_text(timer.overlay_text())
+    if not moved:
         add_trapped_msg()
     else:
-        snake.remove_from_axes(ax)
-        snake.draw_on_axes(ax)
-        canvas.draw()
-        root.after(250, update_canvas)
+        blit()
+    delay = TICK_MS
+    if timer is not None:
+        timer.mark('draw')
+        if ADAPTIVE:
+            delay = max(1, int(TICK_MS - timer.elapsed_ms()))
+        timer.finish(delay if moved else None, len(moved))
+    elif ADAPTIVE:
+        delay = max(1, int(TICK_MS - (time.perf_counter() - start) * 1000))
+    if moved:
+        root.after(delay, update_canvas)
+
+def make_renderers():
+    # All bodies share one board image; each snake's renderer repaints only
+    # its own cells and head patches.
+    global renderers
+    global layer
+    layer = snake_render.BoardLayer(ax, BOARD_SIZE)
+    renderers = [snake_render.SnakeRenderer(snake, ax, BOARD_SIZE, layer)
+                 for snake in snakes]
+    return(renderers)
+
+def draw_animated():
+    for artist in layer.artists():
+        ax.draw_artist(artist)
+    for renderer in renderers:
+        for artist in renderer.artists():
+            ax.draw_artist(artist)
+    if trapped_msg is not None:
+        ax.draw_artist(trapped_msg)
+    if doom_msg is not None:
+        ax.draw_artist(doom_msg)
+    if timing_overlay is not None:
+        ax.draw_artist(timing_overlay)
+
+def blit():
+    # Only the snakes' artists are redrawn, over the cached background, so
+    # a frame costs the same however long the snakes are.
+    canvas.restore_region(background)
+    draw_animated()
+    canvas.blit(ax.bbox)
+
+def _on_draw(event):
+    # A full draw (first show, resize, ...) skips the animated artists and
+    # invalidates the cached background, so recapture it and draw them.
+    global background
+    background = canvas.copy_from_bbox(ax.bbox)
+    draw_animated()
 
 def add_trapped_msg():
     global ax
@@ -69,28 +193,35 @@ def add_trapped_msg():
     width, height = ax.figure.get_size_inches()
     text_height= height * 0.05
     size = text_height * 72
-    trapped_msg = ax.text(0.5, 0.5, 'Your snake is trapped!',
+    msg = ('Your snake is trapped!' if len(snakes) == 1
+           else 'Your snakes are trapped!')
+    trapped_msg = ax.text(0.5, 0.5, msg,
                           horizontalalignment='center',
                           verticalalignment='center',
                           transform=ax.transAxes, size=size,
                           bbox=dict(boxstyle='square',
                                     facecolor='#FF8080',
-                                    edgecolor='#FFCDCD'))
-    canvas.draw()
+                                    edgecolor='#FFCDCD'),
+                          animated=True)
+    blit()
     reset_button.config(state='active')
 
 def _reset():
-    global snake
     global ax
     global canvas
     global trapped_msg
     if trapped_msg is None:
         raise AssertionError('_reset() ran with a trapped_msg!')
     trapped_msg.remove()
-    snake.remove_from_axes(ax)
-    snake = make_snake()
-    snake.draw_on_axes(ax)
-    canvas.draw()
+    trapped_msg = None
+    if doom_msg is not None:
+        doom_msg.set_text('')
+    for renderer in renderers:
+        renderer.remove()
+    layer.remove()
+    make_snakes()
+    make_renderers()
+    blit()
     time.sleep(0.25)
     update_canvas()
     reset_button.config(state='disabled')
@@ -101,9 +232,53 @@ def _quit():
 def main():
     global root
     global reset_button
-    global snake
     global ax
     global canvas
+    global BOARD_SIZE
+    global SNAKE_COUNT
+    global SNAKE_LENGTH
+    global TICK_MS
+    global ADAPTIVE
+    global TIMING_LOG
+    global EARLY_WARNING
+    global timer
+    global timing_overlay
+    global doom_msg
+    parser = argparse.ArgumentParser(description=('Shows snakes exploring '
+                                     'a board at random until they are '
+                                     'trapped.'))
+    parser.add_argument('--snakes', type=int, default=SNAKE_COUNT,
+                        help='Number of snakes sharing the board')
+    parser.add_argument('--length', type=int, default=SNAKE_LENGTH,
+                        help='Body length of each snake')
+    parser.add_argument('--board', type=snake_stats._parse_board,
+                        default=BOARD_SIZE, help='Board size, e.g. 30x30')
+    parser.add_argument('--tick-rate', type=float, default=4,
+                        help='Target ticks per second')
+    parser.add_argument('--adaptive', action='store_true',
+                        help=('Shorten the delay between ticks by the time '
+                              'each tick takes, to hold the tick rate'))
+    parser.add_argument('--early-warning', action='store_true',
+                        help=('Warn as soon as a snake is certain to be '
+                              'trapped'))
+    parser.add_argument('--timing', action='store_true',
+                        help='Time each tick and show an overlay')
+    parser.add_argument('--timing-log', default=None,
+                        help=('Time each tick and write the timings to this '
+                              'CSV (or .json) file on quit'))
+    args = parser.parse_args()
+    if args.tick_rate <= 0:
+        parser.error('--tick-rate must be positive')
+    BOARD_SIZE = args.board
+    SNAKE_COUNT = args.snakes
+    SNAKE_LENGTH = args.length
+    # Tk's after() only takes whole milliseconds.
+    TICK_MS = max(1, int(round(1000 / args.tick_rate)))
+    ADAPTIVE = args.adaptive
+    TIMING_LOG = args.timing_log
+    EARLY_WARNING = args.early_warning
+    make_snakes()
+
     root = Tk.Tk()
     root.wm_title("Meandering Snake")
 
@@ -114,8 +289,6 @@ def main():
     canvas.draw()
     canvas.get_tk_widget().pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
 
-    BOARD_SIZE = (30, 30)
-
     ax.set_aspect('equal')
     ax.set_xlim(0, BOARD_SIZE[0])
     ax.set_ylim(0, BOARD_SIZE[1])
@@ -146,12 +319,30 @@ def main():
     reset_button.config(state='disabled')
     reset_button.pack(side=Tk.BOTTOM)
 
-    snake = make_snake()
-    snake.draw_on_axes(ax)
+    make_renderers()
+    if EARLY_WARNING:
+        doom_msg = ax.text(0.5, 0.02, '', transform=ax.transAxes,
+                           horizontalalignment='center',
+                           verticalalignment='bottom', size=12,
+                           animated=True,
+                           bbox=dict(boxstyle='square', facecolor='#FFE080',
+                                     edgecolor='none'))
+    if args.timing or TIMING_LOG is not None:
+        timer = snake_timing.TickTimer()
+        timing_overlay = ax.text(0.01, 0.99, '', transform=ax.transAxes,
+                                 horizontalalignment='left',
+                                 verticalalignment='top', family='monospace',
+                                 size=9, animated=True,
+                                 bbox=dict(boxstyle='square',
+                                           facecolor='#FFFFFF', alpha=0.7,
+                                           edgecolor='none'))
+    canvas.mpl_connect('draw_event', _on_draw)
     canvas.draw()
 
-    root.after(250, update_canvas)
+    root.after(TICK_MS, update_canvas)
     Tk.mainloop()
+    if TIMING_LOG is not None:
+        timer.write(TIMING_LOG)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,92 @@
+# Vectorized random walk of many independent snakes with NumPy.
+#
+# SnakeBatch moves K snakes of the same length on boards of the same size
+# in lockstep. Each snake's body is a ring buffer of flat cell indices and
+# the boards are one (K, H * W) occupancy array, so a tick for all snakes is
+# a handful of array operations instead of K Snake.move_snake_one calls.
+# The rules are those of update_canvas in meandering_snake.py: a direction
+# is chosen uniformly among the ones that stay on the board and do not hit
+# the body (the tail included, as it has not moved yet), and a snake with
+# no such direction is trapped and retired.
+import collections
+
+import numpy as np
+
+from snake_stats import start_position
+
+# (dx, dy) for up, down, left, right.
+_OFFSETS = np.array([(0, 1), (0, -1), (-1, 0), (1, 0)])
+
+class SnakeBatch:
+    def __init__(self, board_size, length, count, rng=None):
+        if length < 1:
+            raise ValueError('length must be at least 1!')
+        self.board_size = board_size
+        self.length = length
+        self.rng = np.random.default_rng() if rng is None else rng
+        width, height = board_size
+        hx, hy = start_position(board_size, length)
+        # Cells are numbered y * width + x with 0-based x and y, while
+        # Snake positions are 1-based.
+        head = (hy - 1) * width + (hx - 1)
+        self.head = np.full(count, head, dtype=np.int64)
+        # Slot ptr of each ring holds the tail; slots after it are
+        # progressively newer, wrapping around to the neck at ptr - 1.
+        body = head - np.arange(length, 0, -1)
+        self.ring = np.tile(body, (count, 1))
+        self.ptr = np.zeros(count, dtype=np.int64)
+        self.occupied = np.zeros((count, width * height), dtype=bool)
+        self.occupied[:, body] = True
+        self.moves = np.zeros(count, dtype=np.int64)
+        self.active = np.arange(count)
+        self.trapped_at = np.full(count, -1, dtype=np.int64)
+
+    def step(self):
+        # Advances every active snake by one move, retiring the ones that
+        # are trapped. Returns the number of snakes that moved.
+        a = self.active
+        if len(a) == 0:
+            return(0)
+        width, height = self.board_size
+        head = self.head[a]
+        x = head % width
+        y = head // width
+        nx = x[:, np.newaxis] + _OFFSETS[:, 0]
+        ny = y[:, np.newaxis] + _OFFSETS[:, 1]
+        on_board = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+        cand = np.where(on_board, ny * width + nx, 0)
+        valid = on_board & ~self.occupied[a[:, np.newaxis], cand]
+        # Uniform random keys, zeroed for invalid directions: the argmax is
+        # a uniformly random valid direction.
+        keys = self.rng.random(valid.shape) * valid
+        choice = keys.argmax(axis=1)
+        free = valid.any(axis=1)
+        trapped = a[~free]
+        self.trapped_at[trapped] = self.moves[trapped]
+        a = a[free]
+        new_head = cand[free, choice[free]]
+        head = head[free]
+        ptr = self.ptr[a]
+        self.occupied[a, self.ring[a, ptr]] = False
+        self.ring[a, ptr] = head
+        self.occupied[a, head] = True
+        self.ptr[a] = (ptr + 1) % self.length
+        self.head[a] = new_head
+        self.moves[a] += 1
+        self.active = a
+        return(len(a))
+
+    def run(self, max_moves=1000000):
+        # Steps until every snake is trapped or has made max_moves moves.
+        # Snakes still free at the end keep trapped_at == -1.
+        for _ in range(max_moves):
+            if not self.step():
+                break
+        return(self.trapped_at)
+
+def run_batch(board_size, length, episodes, rng, max_moves=1000000):
+    # Same result as snake_stats._run_chunk: a Counter of moves survived
+    # and the number of episodes cut off at max_moves.
+    trapped_at = SnakeBatch(board_size, length, episodes, rng).run(max_moves)
+    survived = collections.Counter(trapped_at[trapped_at >= 0].tolist())
+    return(survived, int((trapped_at < 0).sum()))
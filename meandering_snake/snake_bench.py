@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# Micro-benchmark of the Snake model in snake_classes.py.
+#
+# For snakes of increasing length, times the per-move operations that the
+# app and snake_stats.py repeat millions of times (moving by direction name
+# or letter, and the four-neighbour check of choose_direction), recoloring
+# the body with a colormap, building the head's patches and updating a
+# SnakeRenderer after a move, and reports the hit rates of the colormap and
+# head template caches in snake_classes. It also measures the memory
+# allocated per body segment by the snake itself, by a body snapshot of
+# SnakeBodySegments, by a viridis body gradient, and by a body snapshot once
+# the gradient is set (each segment then gets its own color tuple). The
+# snake climbs a staircase (up, right, up, right, ...) so it never runs into
+# itself however many moves are timed. Results can be written as JSON to
+# compare versions. Run 'python snake_bench.py -h' for the options.
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import snake_classes
+
+def _make_snake(length):
+    return(snake_classes.Snake((0, 0), 'right', length))
+
+def time_moves(length, moves, names):
+    # Seconds per move_snake_one call, alternating between the two names.
+    snake = _make_snake(length)
+    up, right = names
+    start = time.perf_counter()
+    for _ in range(moves // 2):
+        snake.move_snake_one(up)
+        snake.move_snake_one(right)
+    return((time.perf_counter() - start) / (moves // 2 * 2))
+
+def time_checks(length, moves):
+    # Seconds per move of the snake_stats loop: look at all four
+    # neighbours, then move.
+    snake = _make_snake(length)
+    directions = ('up', 'down', 'left', 'right')
+    start = time.perf_counter()
+    for i in range(moves):
+        for direction in directions:
+            snake.is_occupied(snake.get_new_head_pos(direction))
+        snake.move_snake_one('up' if i % 2 == 0 else 'right')
+    return((time.perf_counter() - start) / moves)
+
+def time_recolor(length, repeats):
+    # Seconds per set_body_color call, alternating between two colormaps.
+    # snake_classes imports matplotlib on first use; keep that out of it.
+    snake_classes.get_cmap('viridis')
+    snake = _make_snake(length)
+    start = time.perf_counter()
+    for i in range(repeats):
+        snake.set_body_color('plasma' if i % 2 else 'viridis')
+    return((time.perf_counter() - start) / repeats)
+
+def time_head_patches(repeats):
+    # Seconds per SnakeHead.get_patches call, as the head moves around.
+    snake = _make_snake(4)
+    start = time.perf_counter()
+    for i in range(repeats):
+        snake.head.get_patches()
+        snake.move_snake_one('up' if i % 2 == 0 else 'right')
+    return((time.perf_counter() - start) / repeats)
+
+def time_render_update(repeats):
+    # Seconds per move plus SnakeRenderer.update, on an off-screen figure.
+    from matplotlib.figure import Figure
+    import snake_render
+    axes = Figure().add_subplot()
+    board_size = (repeats // 2 + 20, repeats // 2 + 20)
+    snake = snake_classes.Snake((10, 10), 'right', 4)
+    renderer = snake_render.SnakeRenderer(snake, axes, board_size)
+    start = time.perf_counter()
+    for i in range(repeats):
+        snake.move_snake_one('up' if i % 2 == 0 else 'right')
+        renderer.update()
+    return((time.perf_counter() - start) / repeats)
+
+def _traced(func):
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return(result, size)
+
+def memory(length, color='viridis'):
+    # Bytes allocated per segment by the snake, by a body snapshot with the
+    # default hex color, by set_body_color and by a body snapshot with the
+    # gradient.
+    snake, snake_bytes = _traced(lambda: _make_snake(length))
+    body, body_bytes = _traced(lambda: list(snake.body))
+    del body
+    _, color_bytes = _traced(lambda: snake.set_body_color(color))
+    body, gradient_body_bytes = _traced(lambda: list(snake.body))
+    del body
+    return({
+        'snake_bytes_per_segment': snake_bytes / length,
+        'body_bytes_per_segment': body_bytes / length,
+        'color_bytes_per_segment': color_bytes / length,
+        'gradient_body_bytes_per_segment': gradient_body_bytes / length,
+    })
+
+def bench(length, moves):
+    result = {'length': length, 'moves': moves}
+    result['move_name_ns'] = time_moves(length, moves, ('up', 'right')) * 1e9
+    result['move_letter_ns'] = time_moves(length, moves, ('U', 'R')) * 1e9
+    result['check_and_move_ns'] = time_checks(length, moves) * 1e9
+    result['recolor_us'] = time_recolor(length, max(moves // length, 20)) * 1e6
+    result['head_patches_us'] = time_head_patches(moves // 20) * 1e6
+    result['render_update_us'] = time_render_update(200) * 1e6
+    result.update(memory(length))
+    return(result)
+
+def main():
+    parser = argparse.ArgumentParser(description=('Micro-benchmark of '
+                                     'Snake moves and per-segment memory.'))
+    parser.add_argument('--lengths', type=int, nargs='+',
+                        default=[100, 10000, 1000000],
+                        help='Snake body lengths')
+    parser.add_argument('--moves', type=int, default=200000,
+                        help='Moves timed per measurement')
+    parser.add_argument('--json', default=None,
+                        help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    print('\n{:>9}{:>10}{:>10}{:>10}{:>11}{:>9}{:>11}{:>9}{:>8}{:>9}{:>8}'
+          .format('length', 'name ns', 'letter ns', 'check ns', 'recolor us',
+                  'head us', 'render us', 'snake B', 'body B', 'color B',
+                  'grad B'))
+    print('-' * 104)
+    for length in args.lengths:
+        res = bench(length, args.moves)
+        results.append(res)
+        print('{:>9}{:>10.0f}{:>10.0f}{:>10.0f}{:>11.1f}{:>9.1f}{:>11.1f}'
+              '{:>9.1f}{:>8.1f}{:>9.1f}{:>8.1f}'.format(length,
+                                 res['move_name_ns'],
+                                 res['move_letter_ns'],
+                                 res['check_and_move_ns'],
+                                 res['recolor_us'], res['head_patches_us'],
+                                 res['render_update_us'],
+                                 res['snake_bytes_per_segment'],
+                                 res['body_bytes_per_segment'],
+                                 res['color_bytes_per_segment'],
+                                 res['gradient_body_bytes_per_segment']))
+    caches = snake_classes.cache_stats()
+    print('\ncache hit rates: ' + ', '.join(
+          '{} {:.1%} of {}'.format(name, stats['hit_rate'],
+                                   stats['hits'] + stats['misses'])
+          for name, stats in caches.items()))
+    print()
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'results': results, 'caches': caches}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,105 @@
 # Snake class definitions for meandering_snake.py
-import numpy as np
-import matplotlib as mpl
-import matplotlib.path as mpath
-import matplotlib.patches as mpatches
+import collections
+import collections.abc
+import functools
+
+# numpy and matplotlib are imported by the few functions that draw or use
+# colormaps, so moving snakes needs neither (snake_stats.py runs anywhere)
+# and a missing one fails right where it is needed. The renderers are in
+# snake_render.py.
+
+# Board offsets of one step in each direction, and the direction names that
+# are already known to be valid, so the hot paths can skip validation.
+DIRECTION_OFFSETS = {'U': (0, 1), 'D': (0, -1), 'L': (-1, 0), 'R': (1, 0)}
+_DIRECTION_LETTERS = {'U': 'U', 'D': 'D', 'L': 'L', 'R': 'R',
+                      'up': 'U', 'down': 'D', 'left': 'L', 'right': 'R'}
+
+# Head triangle corners (left corner from the snake's perspective, tip,
+# right corner) and left and right eye centers, relative to the head's
+# position. Heads are drawn by translating these.
+HEAD_CORNERS = {
+    'U': ((-1, -1), (-0.5, 0), (0, -1)),
+    'D': ((0, 0), (-0.5, -1), (-1, 0)),
+    'L': ((0, -1), (-1, -0.5), (0, 0)),
+    'R': ((-1, 0), (0, -0.5), (-1, -1)),
+}
+EYE_OFFSETS = {
+    'U': ((-0.65, -0.75), (-0.35, -0.75)),
+    'D': ((-0.35, -0.25), (-0.65, -0.25)),
+    'L': ((-0.25, -0.65), (-0.25, -0.35)),
+    'R': ((-0.75, -0.35), (-0.75, -0.65)),
+}
+EYE_RADIUS = 0.05
+
+# Colormaps, gradients and head templates are memoized with lru_cache, so
+# recoloring and redrawing reuse them; see cache_stats() for hit rates.
+# Cached values are shared, so gradients are read-only arrays and head
+# templates are read-only Paths.
+@functools.lru_cache(maxsize=64)
+def get_cmap(name):
+    # mpl.cm.get_cmap was removed in matplotlib 3.9; the colormaps registry
+    # replaces it (and raises KeyError rather than ValueError). Callers
+    # must not modify the returned colormap.
+    import matplotlib as mpl
+    if hasattr(mpl, 'colormaps'):
+        try:
+            return(mpl.colormaps[name])
+        except KeyError as e:
+            raise ValueError('{} is not a colormap name!'.format(name)) from e
+    return(mpl.cm.get_cmap(name))
+
+@functools.lru_cache(maxsize=256)
+def body_gradient(name, length):
+    # RGBA colors of colormap name at length evenly spaced points, as a
+    # read-only (length, 4) array.
+    import numpy as np
+    colors = get_cmap(name)(np.linspace(0, 1, length))
+    colors.setflags(write=False)
+    return(colors)
+
+@functools.lru_cache(maxsize=4)
+def head_template(direction):
+    # The head's triangle Path for a head at (0, 0) facing direction. Its
+    # vertices plus the head's position give the triangle on the board.
+    import matplotlib.path as mpath
+    corners = list(HEAD_CORNERS[direction])
+    return(mpath.Path(corners + corners[:1],
+                      [mpath.Path.MOVETO, mpath.Path.LINETO,
+                       mpath.Path.LINETO, mpath.Path.CLOSEPOLY],
+                      readonly=True))
+
+def head_eyes(direction, position):
+    # The centers of the two eyes of a head at position facing direction.
+    x, y = position
+    return(tuple((x + dx, y + dy) for dx, dy in EYE_OFFSETS[direction]))
+
+def head_geometry(direction, position):
+    # A new head triangle Path and the two eye centers for a head at
+    # position facing direction.
+    import matplotlib.path as mpath
+    template = head_template(direction)
+    path = mpath.Path(template.vertices + position, template.codes)
+    return(path, head_eyes(direction, position))
+
+def cache_stats():
+    # Hits, misses, size and hit rate of each cache.
+    stats = {}
+    for name, func in (('cmap', get_cmap), ('gradient', body_gradient),
+                       ('head_template', head_template)):
+        info = func.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {'hits': info.hits, 'misses': info.misses,
+                       'size': info.currsize,
+                       'hit_rate': info.hits / lookups if lookups else 0.0}
+    return(stats)
+
+def cache_clear():
+    for func in (get_cmap, body_gradient, head_template):
+        func.cache_clear()
 
 class SnakeSegment:
+    __slots__ = ('position', 'color', 'label')
+
     def __init__(self, position, color='#000000', label=''):
         # Instance Variable Assignment
         self.position = self.validate_position(position)
@@ -44,6 +139,7 @@ class SnakeSegment:
         return(hex_string)
 
     def get_patches(self):
+        import matplotlib.patches as mpatches
         patch_list = []
         patch_list.append(mpatches.Rectangle(xy=(self.position[0] - 1,
                                                 self.position[1] - 1),
@@ -55,6 +151,8 @@ class SnakeSegment:
         return(patch_list)
 
 class SnakeHead(SnakeSegment):
+    __slots__ = ('eye_color', 'direction')
+
     def __init__(self, position, direction,
                  color='#000000', eye_color='#FF0000',
                  label=''):
@@ -76,71 +174,19 @@ class SnakeHead(SnakeSegment):
         return(direction)
 
     def get_patches(self):
-        patch_list = [] 
-        # Always start at left corner (snake's perspective,
-        # then move to tip, then right corner, then close
-        if self.direction == 'U':
-            path_data = [
-                (mpath.Path.MOVETO, (self.position[0] - 1, self.position[1] - 1)),
-                (mpath.Path.LINETO, (self.position[0] - 0.5, self.position[1])),
-                (mpath.Path.LINETO, (self.position[0], self.position[1] - 1)),
-                (mpath.Path.CLOSEPOLY, (self.position[0] - 1, self.position[1] - 1))
-            ]
-        elif self.direction == 'D':
-            path_data = [
-                (mpath.Path.MOVETO, (self.position[0], self.position[1])),
-                (mpath.Path.LINETO, (self.position[0] - 0.5, self.position[1] - 1)),
-                (mpath.Path.LINETO, (self.position[0] - 1, self.position[1])),
-                (mpath.Path.CLOSEPOLY, (self.position[0], self.position[1]))
-            ]
-        elif self.direction == 'L':
-            path_data = [
-                (mpath.Path.MOVETO, (self.position[0], self.position[1] - 1)),
-                (mpath.Path.LINETO, (self.position[0] - 1, self.position[1] - 0.5)),
-                (mpath.Path.LINETO, (self.position[0], self.position[1])),
-                (mpath.Path.CLOSEPOLY, (self.position[0], self.position[1] - 1))
-            ]
-        elif self.direction == 'R':
-            path_data = [
-                (mpath.Path.MOVETO, (self.position[0] - 1, self.position[1])),
-                (mpath.Path.LINETO, (self.position[0], self.position[1] - 0.5)),
-                (mpath.Path.LINETO, (self.position[0] - 1, self.position[1] - 1)),
-                (mpath.Path.CLOSEPOLY, (self.position[0] - 1, self.position[1]))
-            ]
-        else:
+        import matplotlib.patches as mpatches
+        patch_list = []
+        if self.direction not in HEAD_CORNERS:
             raise AssertionError('self.direction wasn\'t U, D, L, or R!')
-        codes, verts = zip(*path_data)
-        head_path = mpath.Path(verts, codes)
+        head_path, (le_position, re_position) = head_geometry(self.direction,
+                                                              self.position)
         head = mpatches.PathPatch(head_path,
                                   edgecolor=None, linewidth=0,
                                   facecolor=self.color, label=self.label)
-        eye_direction_offset = {
-                'U': {
-                    'left': (-0.65, -0.75),
-                    'right': (-0.35, -0.75)
-                     },
-                'D': {
-                    'left': (-0.35, -0.25),
-                    'right': (-0.65, -0.25)
-                     },
-                'L': {
-                    'left': (-0.25, -0.65),
-                    'right': (-0.25, -0.35)
-                     },
-                'R': {
-                    'left': (-0.75, -0.35),
-                    'right': (-0.75, -0.65)
-                     }
-        }
-        EYE_RADIUS = 0.05
-        le_position = (self.position[0] + eye_direction_offset[self.direction]['left'][0],
-                       self.position[1] + eye_direction_offset[self.direction]['left'][1])
         left_eye = mpatches.Circle(xy = le_position,
                                    radius = EYE_RADIUS,
                                    edgecolor=None, linewidth=0,
                                    facecolor=self.eye_color, label=self.label)
-        re_position = (self.position[0] + eye_direction_offset[self.direction]['right'][0],
-                       self.position[1] + eye_direction_offset[self.direction]['right'][1])
         right_eye = mpatches.Circle(xy = re_position,
                                     radius = EYE_RADIUS,
                                     edgecolor=None, linewidth=0,
@@ -151,56 +197,130 @@ class SnakeHead(SnakeSegment):
         return(patch_list)
 
 class SnakeBodySegment(SnakeSegment):
+    __slots__ = ()
+
     def __init__(self, position, color, label=''):
         SnakeSegment.__init__(self, position, color, label=label)
 
+class _BodySegmentView(SnakeBodySegment):
+    # A body segment handed out by SnakeBody. The snake doesn't keep
+    # segment objects, so a change to one would be lost; refuse it instead.
+    # Validation is skipped for values the Snake already owns: colors set
+    # from a colormap are RGBA tuples, which validate_hex would reject.
+    __slots__ = ()
+
+    def __init__(self, position, color, label=''):
+        object.__setattr__(self, 'position', position)
+        object.__setattr__(self, 'color', color)
+        object.__setattr__(self, 'label', label)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('body segments are read-only! Move the snake '
+                             'or use Snake.set_body_color instead.')
+
+class SnakeBody(collections.abc.Sequence):
+    # Live, read-only view of a snake's body as SnakeBodySegments, neck
+    # first. It follows the snake as it moves and is recolored, but it
+    # can't be changed itself: there is no append and segments can't be
+    # assigned to. Segments are built when indexed.
+    __slots__ = ('_snake',)
+
+    def __init__(self, snake):
+        self._snake = snake
+
+    def __len__(self):
+        return(len(self._snake._body))
+
+    def _color(self, i):
+        color = self._snake._colors[i]
+        if not isinstance(color, str):
+            color = tuple(color.tolist())
+        return(color)
+
+    def __getitem__(self, i):
+        snake = self._snake
+        if isinstance(i, slice):
+            return([self[j] for j in range(*i.indices(len(self)))])
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('body index out of range!')
+        return(_BodySegmentView(snake._body[i], self._color(i), snake.label))
+
+    def __iter__(self):
+        snake = self._snake
+        colors = snake._colors
+        if not isinstance(colors, list):
+            colors = map(tuple, colors.tolist())
+        for position, color in zip(snake._body, colors):
+            yield _BodySegmentView(position, color, snake.label)
+
+    def __repr__(self):
+        return('SnakeBody({})'.format(list(self)))
+
 class Snake:
+    # The body is kept as a deque of positions, neck first, plus a set of
+    # the cells it occupies. Moving pushes the old head position onto the
+    # front and pops the tail, and collision checks are set lookups, so a
+    # move costs O(1) regardless of length. Colors are stored per body
+    # index, so the gradient stays put along the body as it moves: a list
+    # of one shared hex string, or an (length, 4) RGBA array for a
+    # colormap. Directions are validated when they come in through the
+    # public methods; the common names skip straight to a dict lookup.
     def __init__(self, head_position, head_direction,
                  length, color='#000000', eye_color='#FF0000',
                  label=''):
         self.head = SnakeHead(head_position, head_direction,
                               color=color, eye_color=eye_color, label=label)
-        self.body = []
-        if self.head.direction == 'U':
-            body_offset = (0, -1)
-        elif self.head.direction == 'D':
-            body_offset = (0, 1)
-        elif self.head.direction == 'L':
-            body_offset = (1, 0)
-        elif self.head.direction == 'R':
-            body_offset = (-1, 0)
-        else:
-            raise AssertionError('Snake\'s head\'s direction is not U, D, L, or R!')
-        for i in range(length):
-            self.body.append(SnakeBodySegment(( head_position[0] + ((i+1) * body_offset[0]),
-                                                head_position[1] + ((i+1) * body_offset[1]) ),
-                                              color=color, label=label))
+        dx, dy = DIRECTION_OFFSETS[self.head.direction]
+        head_position = self.head.position
+        self._body = collections.deque(
+                (head_position[0] - ((i+1) * dx),
+                 head_position[1] - ((i+1) * dy))
+                for i in range(length))
+        self._occupied = set(self._body)
+        self._colors = [self.head.color] * length
+        self.body_color = self.head.color
+        self.moves = 0
         self.label = label
 
+    @property
+    def body(self):
+        # Live, read-only SnakeBody view; see SnakeBody.
+        return(SnakeBody(self))
+
+    def __len__(self):
+        return(len(self._body))
+
+    def is_occupied(self, position):
+        return(tuple(position) in self._occupied)
+
+    def _direction(self, direction):
+        try:
+            return(_DIRECTION_LETTERS[direction])
+        except (KeyError, TypeError):
+            return(self.head.validate_direction(direction))
+
     def get_new_head_pos(self, direction):
-        direction = self.head.validate_direction(direction)
-        direction_offset = {
-                'U': (0, 1),
-                'D': (0, -1),
-                'L': (-1, 0),
-                'R': (1, 0)
-        }
-        new_head_pos = (self.head.position[0] + direction_offset[direction][0],
-                        self.head.position[1] + direction_offset[direction][1])
-        return(new_head_pos)
+        dx, dy = DIRECTION_OFFSETS[self._direction(direction)]
+        position = self.head.position
+        return((position[0] + dx, position[1] + dy))
 
     def move_snake_one(self, direction):
-        direction = self.head.validate_direction(direction)
-        new_head_pos = self.get_new_head_pos(direction)
-        for bs in self.body:
-            if bs.position == new_head_pos:
-                raise ValueError('Can\'t go that direction, a body '
-                                 'segment is there!')
-        for i in range(len(self.body) - 1, 0, -1):
-            self.body[i].position = self.body[i - 1].position
-        self.body[0].position = self.head.position
+        direction = self._direction(direction)
+        dx, dy = DIRECTION_OFFSETS[direction]
+        position = self.head.position
+        new_head_pos = (position[0] + dx, position[1] + dy)
+        if new_head_pos in self._occupied:
+            raise ValueError('Can\'t go that direction, a body '
+                             'segment is there!')
+        if self._body:
+            self._occupied.discard(self._body.pop())
+            self._body.appendleft(position)
+            self._occupied.add(position)
         self.head.position = new_head_pos
         self.head.direction = direction
+        self.moves += 1
 
     def get_patches(self):
         patch_list = []
@@ -243,22 +363,74 @@ class Snake:
     def set_body_color(self, color):
         hex = None
         try:
-            color = self.body[0].validate_hex(color)
+            color = self.head.validate_hex(color)
             hex = True
         except ValueError as e:
             try:
-                cmap = mpl.cm.get_cmap(color)
+                get_cmap(color)
                 hex = False
-            except ValueError:
+            except (ValueError, TypeError):
                 raise ValueError('color must be a hex color or a '
                                  'matplotlib colormap name!') from e
         if hex:
-            for bs in self.body:
-                bs.color = color
+            self._colors = [color] * len(self._body)
         else:
-            colors = np.linspace(0, 1, len(self.body))
-            for bs, c in zip(self.body, colors):
-                bs.color = cmap(c)
+            self._colors = body_gradient(color, len(self._body))
+        self.body_color = color
+
+class Board:
+    # Shared occupancy index for any number of snakes on one board. Every
+    # occupied cell, heads included, maps to the snake in it, so checking
+    # a move is one dict lookup however many snakes there are and however
+    # long they are. Snakes on a board must be moved with move_snake() so
+    # the index stays current.
+    def __init__(self, board_size):
+        self.board_size = board_size
+        self.snakes = []
+        self._owner = {}
+
+    def on_board(self, position):
+        return(1 <= position[0] <= self.board_size[0]
+               and 1 <= position[1] <= self.board_size[1])
+
+    def owner(self, position):
+        # The snake occupying position, or None.
+        return(self._owner.get(tuple(position)))
+
+    def is_free(self, position):
+        position = tuple(position)
+        return(self.on_board(position) and position not in self._owner)
+
+    def add_snake(self, snake):
+        cells = [snake.head.position] + list(snake._body)
+        for cell in cells:
+            if not self.is_free(cell):
+                raise ValueError('snake doesn\'t fit on the board at '
+                                 '{}!'.format(cell))
+        for cell in cells:
+            self._owner[cell] = snake
+        self.snakes.append(snake)
+
+    def remove_snake(self, snake):
+        for cell in [snake.head.position] + list(snake._body):
+            del self._owner[cell]
+        self.snakes.remove(snake)
+
+    def free_directions(self, snake):
+        # The directions (as 'U', 'D', 'L', 'R') that snake can move in.
+        x, y = snake.head.position
+        return([d for d, (dx, dy) in DIRECTION_OFFSETS.items()
+                if self.is_free((x + dx, y + dy))])
+
+    def move_snake(self, snake, direction):
+        new_head_pos = snake.get_new_head_pos(direction)
+        if not self.is_free(new_head_pos):
+            raise ValueError('Can\'t go that direction, the cell is off the '
+                             'board or taken!')
+        vacated = snake._body[-1] if snake._body else snake.head.position
+        snake.move_snake_one(direction)
+        del self._owner[vacated]
+        self._owner[new_head_pos] = snake
 
 def main():
     pass
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# Offline GIF/MP4 export of a meandering snake, without Tk.
+#
+# Runs a snake with the rules of meandering_snake.py until it is trapped (or
+# for a given number of moves) and rasterizes every frame straight into a
+# uint8 array: one block of scale x scale pixels per board cell, the body
+# gradient from set_body_color, and the head triangle and eyes of
+# SnakeHead.get_patches. No matplotlib figure is made; matplotlib is only
+# used once to look up the body colormap.
+#
+# Frames are palette images: index 0 is the board, 1 the border, 2 the head,
+# 3 the eyes and 4-255 the body gradient from neck to tail. GIFs are written
+# with Pillow directly from the palette frames, so no per-frame color
+# quantization is needed. MP4s are piped as raw RGB frames to ffmpeg.
+import argparse
+import random
+import subprocess
+
+import numpy as np
+
+import snake_classes
+import snake_stats
+
+BOARD_COLOR = '#C1C1C1'
+BORDER_COLOR = '#000000'
+_BODY_LEVELS = 252
+
+# Head triangle corners and eye centers in cell coordinates, (0, 0) being
+# the lower left corner of the head's cell, from the templates that
+# SnakeHead.get_patches translates.
+_HEAD_TRIANGLES = {d: tuple((x + 1, y + 1) for x, y in corners)
+                   for d, corners in snake_classes.HEAD_CORNERS.items()}
+_EYES = {d: tuple((x + 1, y + 1) for x, y in eyes)
+         for d, eyes in snake_classes.EYE_OFFSETS.items()}
+
+def _hex_to_rgb(color):
+    color = color.lstrip('#')
+    return(tuple(int(color[i:i + 2], 16) for i in (0, 2, 4)))
+
+def _head_sprites(scale):
+    # For each direction, a (scale, scale) array that is 0 where the board
+    # or body shows through, 2 on the head and 3 on the eyes, with image
+    # rows running top to bottom.
+    centers = (np.arange(scale) + 0.5) / scale
+    u = centers[np.newaxis, :]
+    v = centers[::-1, np.newaxis]
+    # Keep the eyes at least about a pixel across at small scales.
+    radius = max(snake_classes.EYE_RADIUS, 0.75 / scale)
+    sprites = {}
+    for direction, (a, b, c) in _HEAD_TRIANGLES.items():
+        def side(p, q):
+            return((q[0] - p[0]) * (v - p[1]) - (q[1] - p[1]) * (u - p[0]))
+        s1, s2, s3 = side(a, b), side(b, c), side(c, a)
+        inside = (((s1 >= 0) & (s2 >= 0) & (s3 >= 0))
+                  | ((s1 <= 0) & (s2 <= 0) & (s3 <= 0)))
+        sprite = np.where(inside, 2, 0).astype(np.uint8)
+        for ex, ey in _EYES[direction]:
+            sprite[(u - ex) ** 2 + (v - ey) ** 2 <= radius ** 2] = 3
+        sprites[direction] = sprite
+    return(sprites)
+
+class FrameRasterizer:
+    # Turns a Snake into palette frames. Like SnakeRenderer, each cell
+    # remembers the move count at which the neck entered it, so after one
+    # move only two cells change, and the gradient color of every cell is
+    # one vectorized lookup of moves - stamp.
+    def __init__(self, snake, board_size, scale=16, border=None):
+        self.snake = snake
+        self.board_size = board_size
+        self.scale = scale
+        self.border = max(1, scale // 4) if border is None else border
+        if self.border < 0:
+            raise ValueError('border must not be negative!')
+        width, height = board_size
+        self.palette = self._make_palette()
+        self._stamps = np.full((height, width), np.iinfo(np.int64).min)
+        self._moves = None
+        self._tail = None
+        self._sprites = _head_sprites(scale)
+        b = self.border
+        self._frame = np.ones((height * scale + 2 * b, width * scale + 2 * b),
+                              dtype=np.uint8)
+        # Sliced by size rather than [b:-b], which is empty for b == 0.
+        self._inner = self._frame[b:b + height * scale, b:b + width * scale]
+        # The same pixels as (cell row, pixel row, cell column, pixel
+        # column), a view that a (height, 1, width, 1) array of cells
+        # broadcasts into, so each cell fills its scale x scale block.
+        self._blocks = self._inner.reshape(height, scale, width, scale)
+
+    def _make_palette(self):
+        palette = np.zeros((256, 3), dtype=np.uint8)
+        palette[0] = _hex_to_rgb(BOARD_COLOR)
+        palette[1] = _hex_to_rgb(BORDER_COLOR)
+        palette[2] = _hex_to_rgb(self.snake.head.color)
+        palette[3] = _hex_to_rgb(self.snake.head.eye_color)
+        color = self.snake.body_color
+        if isinstance(color, str) and color.startswith('#'):
+            palette[4:4 + _BODY_LEVELS] = _hex_to_rgb(color)
+        else:
+            rgba = snake_classes.body_gradient(color, _BODY_LEVELS)
+            palette[4:4 + _BODY_LEVELS] = np.round(rgba[:, :3] * 255)
+        return(palette)
+
+    def _cell(self, position):
+        return(position[1] - 1, position[0] - 1)
+
+    def _sync(self):
+        snake = self.snake
+        if self._moves is not None and snake.moves == self._moves + 1:
+            if snake._body:
+                self._stamps[self._cell(self._tail)] = np.iinfo(np.int64).min
+                self._stamps[self._cell(snake._body[0])] = snake.moves
+        elif snake.moves != self._moves:
+            self._stamps[:] = np.iinfo(np.int64).min
+            for i, position in enumerate(snake._body):
+                self._stamps[self._cell(position)] = snake.moves - i
+        self._moves = snake.moves
+        self._tail = snake._body[-1] if snake._body else None
+
+    def frame(self):
+        # The current frame as a 2-D uint8 array of palette indices. The
+        # array is reused; copy it to keep it past the next call.
+        self._sync()
+        snake = self.snake
+        index = snake.moves - self._stamps
+        length = len(snake)
+        empty = (index < 0) | (index >= length)
+        level = index * (_BODY_LEVELS - 1) // max(length - 1, 1)
+        cells = np.where(empty, 0, 4 + np.clip(level, 0, _BODY_LEVELS - 1))
+        cells = cells.astype(np.uint8)
+        s = self.scale
+        inner = self._inner
+        # Board rows are flipped so that y grows upwards.
+        self._blocks[:] = cells[::-1, np.newaxis, :, np.newaxis]
+        x, y = snake.head.position
+        top = (self.board_size[1] - y) * s
+        left = (x - 1) * s
+        sprite = self._sprites[snake.head.direction]
+        block = inner[top:top + s, left:left + s]
+        block[sprite != 0] = sprite[sprite != 0]
+        return(self._frame)
+
+def run_frames(snake, board_size, rasterizer, rng, max_moves=None):
+    # Yields the starting frame and one frame per move until the snake is
+    # trapped or has made max_moves moves.
+    yield rasterizer.frame()
+    while max_moves is None or snake.moves < max_moves:
+        direction = snake_stats.choose_direction(snake, board_size, rng)
+        if direction is None:
+            return
+        snake.move_snake_one(direction)
+        yield rasterizer.frame()
+
+def write_gif(frames, path, palette, fps):
+    from PIL import Image
+    flat_palette = palette.reshape(-1).tolist()
+
+    def images():
+        for frame in frames:
+            # fromarray makes an 'L' image (its mode argument is
+            # deprecated); putpalette turns it into a 'P' one.
+            image = Image.fromarray(frame.copy())
+            image.putpalette(flat_palette)
+            yield image
+
+    images = images()
+    first = next(images)
+    first.save(path, save_all=True, append_images=images,
+               duration=int(round(1000 / fps)), loop=0, optimize=False)
+
+def write_mp4(frames, path, palette, fps, shape):
+    # Streams raw RGB frames to ffmpeg, which must be on the PATH.
+    height, width = shape
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo',
+           '-pix_fmt', 'rgb24', '-s', '{}x{}'.format(width, height),
+           '-r', str(fps), '-i', '-', '-an', '-c:v', 'libx264',
+           '-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+           path]
+    try:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    except FileNotFoundError:
+        raise RuntimeError('MP4 export needs ffmpeg on the PATH!') from None
+    try:
+        for frame in frames:
+            proc.stdin.write(palette[frame].tobytes())
+    finally:
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError('ffmpeg failed with exit code {}'.format(
+                               proc.returncode))
+
+def export(path, board_size=(30, 30), length=16, body_color='viridis',
+           scale=16, fps=4, max_moves=None, seed=None):
+    # Runs one snake and writes its animation to path, as MP4 if path ends
+    # in .mp4 and as GIF otherwise. Returns the number of moves made.
+    rng = random.Random(seed)
+    snake = snake_classes.Snake(snake_stats.start_position(board_size, length),
+                                'right', length, label='snake1')
+    snake.set_body_color(body_color)
+    rasterizer = FrameRasterizer(snake, board_size, scale)
+    frames = run_frames(snake, board_size, rasterizer, rng, max_moves)
+    if path.lower().endswith('.mp4'):
+        write_mp4(frames, path, rasterizer.palette, fps,
+                  rasterizer._frame.shape)
+    else:
+        write_gif(frames, path, rasterizer.palette, fps)
+    return(snake.moves)
+
+def main():
+    parser = argparse.ArgumentParser(description=('Exports a meandering '
+                                     'snake run as a GIF or MP4 without a '
+                                     'display.'))
+    parser.add_argument('output', help='Output file, .gif or .mp4')
+    parser.add_argument('--board', type=snake_stats._parse_board,
+                        default=(30, 30), help='Board size, e.g. 30x30')
+    parser.add_argument('--length', type=int, default=16,
+                        help='Snake body length')
+    parser.add_argument('--color', default='viridis',
+                        help='Body hex color or matplotlib colormap name')
+    parser.add_argument('--scale', type=int, default=16,
+                        help='Pixels per board cell')
+    parser.add_argument('--fps', type=float, default=4,
+                        help='Frames per second (the app ticks at 4)')
+    parser.add_argument('--moves', type=int, default=None,
+                        help='Stop after this many moves')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed for a reproducible run')
+    args = parser.parse_args()
+    moves = export(args.output, board_size=args.board, length=args.length,
+                   body_color=args.color, scale=args.scale, fps=args.fps,
+                   max_moves=args.moves, seed=args.seed)
+    print('{} moves written to {}'.format(moves, args.output))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+# Drawing of snake_classes.Snake on matplotlib axes for meandering_snake.py
+import numpy as np
+import matplotlib.colors as mcolors
+
+import snake_classes
+
+class BoardLayer:
+    # A single RGBA image covering the whole board that any number of
+    # SnakeRenderers paint their bodies into, so a frame draws one image
+    # however many snakes there are. Each renderer only touches its own
+    # snake's cells; empty cells are transparent.
+    def __init__(self, axes, board_size):
+        self.rgba = np.zeros((board_size[1], board_size[0], 4))
+        self.image = axes.imshow(self.rgba,
+                                 extent=(0, board_size[0], 0, board_size[1]),
+                                 origin='lower', interpolation='nearest',
+                                 animated=True)
+        self.dirty = False
+
+    def artists(self):
+        # set_data copies the array, so push the changes once per frame.
+        if self.dirty:
+            self.image.set_data(self.rgba)
+            self.dirty = False
+        return([self.image])
+
+    def remove(self):
+        self.image.remove()
+
+class SnakeRenderer:
+    # Draws a Snake with a fixed set of artists that are updated in place,
+    # instead of removing and re-adding one patch per segment every tick.
+    #
+    # On its own, the body is a single image with one pixel per board cell.
+    # Each cell holds a "stamp": the move count when the snake's neck
+    # entered it, so the body index of a cell is moves - stamp. The image
+    # is colored by a reversed copy of the body colormap normalized to
+    # [moves - (length - 1), moves], which reproduces set_body_color's
+    # gradient from neck to tail while only the new neck and the vacated
+    # tail cell change per move. Empty cells are NaN and transparent.
+    #
+    # Given a BoardLayer instead, the body is painted into the shared RGBA
+    # image. The body cells are kept in a ring buffer in which the new neck
+    # overwrites the old tail, so a move is one cell cleared and one
+    # vectorized write of the gradient, with no per-snake image to draw.
+    # Call update() once after each move of the snake. When several snakes
+    # move in one tick, update their renderers in the order they moved, so
+    # a cell vacated by one snake and taken by a later one is painted last
+    # by the later one.
+    #
+    # The head is one PathPatch and two Circles that are moved in place: the
+    # triangle's vertices are rewritten from snake_classes.head_template.
+    # All artists are animated, so they are left out of full canvas draws
+    # and can be blitted over a cached background; see artists().
+    def __init__(self, snake, axes, board_size, layer=None):
+        self.snake = snake
+        self.axes = axes
+        self.board_size = board_size
+        self.layer = layer
+        if layer is None:
+            self._stamps = np.full((board_size[1], board_size[0]), np.nan)
+            self.image = axes.imshow(self._stamps, cmap=self._body_cmap(),
+                                     extent=(0, board_size[0],
+                                             0, board_size[1]),
+                                     origin='lower', interpolation='nearest',
+                                     animated=True)
+        else:
+            self.image = None
+            self._ring = None
+        self.head_patches = snake.head.get_patches()
+        for patch in self.head_patches:
+            patch.set_animated(True)
+            axes.add_patch(patch)
+        self._head = (snake.head.direction, snake.head.position)
+        # The head patch's own Path, made by head_geometry, is not shared.
+        self._head_vertices = self.head_patches[0].get_path().vertices
+        self._moves = None
+        self._tail = None
+        self._body_color = snake.body_color
+        self.update()
+
+    def _body_cmap(self):
+        color = self.snake.body_color
+        if isinstance(color, str) and color.startswith('#'):
+            return(mcolors.ListedColormap([color]))
+        return(snake_classes.get_cmap(color).reversed())
+
+    def _cell(self, position):
+        # Board positions are 1-based: cell (x, y) covers [x-1, x] x [y-1, y].
+        return(position[1] - 1, position[0] - 1)
+
+    def _repaint(self):
+        self._stamps[:] = np.nan
+        for i, position in enumerate(self.snake._body):
+            self._stamps[self._cell(position)] = self.snake.moves - i
+
+    def _update_image(self, step):
+        snake = self.snake
+        if step:
+            if snake._body:
+                self._stamps[self._cell(self._tail)] = np.nan
+                self._stamps[self._cell(snake._body[0])] = snake.moves
+        elif snake.moves != self._moves:
+            self._repaint()
+        if snake.body_color != self._body_color:
+            self._body_color = snake.body_color
+            self.image.set_cmap(self._body_cmap())
+        self.image.set_data(self._stamps)
+        self.image.set_clim(snake.moves - max(len(snake) - 1, 0),
+                            snake.moves)
+
+    def _update_layer(self, step):
+        snake = self.snake
+        rgba = self.layer.rgba
+        length = len(snake)
+        if length == 0:
+            return
+        recolor = snake.body_color != self._body_color or self._ring is None
+        if step:
+            rgba[self._cell(self._tail)] = 0
+            # The tail's slot is just before the neck's; the new neck
+            # takes it over.
+            self._start = (self._start - 1) % length
+            row, col = self._cell(snake._body[0])
+            self._ring[0][self._start] = row
+            self._ring[1][self._start] = col
+        elif snake.moves != self._moves or recolor:
+            if self._ring is not None:
+                rgba[self._ring] = 0
+            cells = np.array([self._cell(p) for p in snake._body])
+            self._ring = (cells[:, 0], cells[:, 1])
+            self._start = 0
+        else:
+            return
+        if recolor:
+            self._body_color = snake.body_color
+            colors = mcolors.to_rgba_array(snake._colors)
+            self._colors2 = np.concatenate((colors, colors))
+        # Slot s holds body index (s - start) % length.
+        rgba[self._ring] = self._colors2[length - self._start:
+                                         2 * length - self._start]
+        self.layer.dirty = True
+
+    def update(self):
+        # Brings the artists up to date with the snake. After exactly one
+        # move this touches two cells; otherwise the body is repainted.
+        snake = self.snake
+        step = self._moves is not None and snake.moves == self._moves + 1
+        if self.layer is None:
+            self._update_image(step)
+        else:
+            self._update_layer(step)
+        self._moves = snake.moves
+        self._tail = snake._body[-1] if snake._body else None
+        head = (snake.head.direction, snake.head.position)
+        if head != self._head:
+            self._head = head
+            direction, position = head
+            np.add(snake_classes.head_template(direction).vertices, position,
+                   out=self._head_vertices)
+            self.head_patches[0].stale = True
+            left, right = snake_classes.head_eyes(direction, position)
+            self.head_patches[1].set_center(left)
+            self.head_patches[2].set_center(right)
+
+    def artists(self):
+        # The animated artists, in the order they should be drawn. With a
+        # BoardLayer, the layer's image is drawn once by its owner instead.
+        if self.layer is None:
+            return([self.image] + self.head_patches)
+        return(list(self.head_patches))
+
+    def remove(self):
+        for artist in self.artists():
+            artist.remove()
+        if self.layer is not None and self._ring is not None:
+            self.layer.rgba[self._ring] = 0
+            self.layer.dirty = True
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# Headless Monte Carlo statistics for meandering_snake.py.
+#
+# Runs many random snakes to completion, with no display and no
+# matplotlib, and counts how many moves each one survives before it is
+# trapped. The movement rules are those of update_canvas in
+# meandering_snake.py, applied to snake_classes.Snake: every tick, one of
+# the directions that stays on the board and does not hit the body is
+# chosen uniformly at random, and the snake is trapped when there is none.
+# Episodes are spread over a process pool in chunks whose seeds derive from
+# one master seed, so results are reproducible whatever the number of jobs.
+# With --engine batch, each chunk runs as one vectorized SnakeBatch
+# (snake_batch.py, needs numpy) instead of one Snake object per episode.
+# With --check-traps, snake_trap.TrapDetector follows each snake until it
+# finds the trap certain, and every trapped episode checks the prediction
+# and records how many moves ahead it came. This only adds work; the
+# survival histograms are the same as without it, for the same seed.
+import argparse
+import collections
+import concurrent.futures
+import csv
+import hashlib
+import os
+import random
+import sys
+
+import snake_classes
+import snake_trap
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+def start_position(board_size, length):
+    # Same starting spot as make_snake in meandering_snake.py: right of
+    # center, facing right, with the body trailing off to the left.
+    head = (board_size[0] // 2 + 4, board_size[1] // 2)
+    if head[0] > board_size[0] or head[1] < 1 or head[0] - length < 1:
+        raise ValueError('a snake of length {} does not fit on a {}x{} '
+                         'board!'.format(length, *board_size))
+    return(head)
+
+def choose_direction(snake, board_size, rng):
+    # A uniformly random direction among those that keep the head on the
+    # board and off the body, or None if the snake is trapped.
+    width, height = board_size
+    valid = []
+    for direction in DIRECTIONS:
+        x, y = snake.get_new_head_pos(direction)
+        if (1 <= x <= width and 1 <= y <= height
+                and not snake.is_occupied((x, y))):
+            valid.append(direction)
+    if not valid:
+        return(None)
+    return(rng.choice(valid))
+
+def run_episode(board_size, length, rng, max_moves, leads=None):
+    # Returns the number of moves the snake made before it was trapped, or
+    # None if it was still free after max_moves moves. If leads is a
+    # Counter, a TrapDetector follows the snake until it finds the trap
+    # certain, and a trapped episode adds one to leads[(predicted, actual)]:
+    # the moves from doomed_at to the predicted trapped_by and to the real
+    # trap. The random draws are the same either way.
+    snake = snake_classes.Snake(start_position(board_size, length), 'right',
+                                length)
+    detector = None
+    if leads is not None:
+        detector = snake_trap.TrapDetector(snake, board_size)
+    for moves in range(max_moves):
+        direction = choose_direction(snake, board_size, rng)
+        if direction is None:
+            if detector is not None:
+                _check_prediction(detector, moves, leads)
+            return(moves)
+        snake.move_snake_one(direction)
+        if detector is not None and not detector.doomed:
+            detector.update()
+    return(None)
+
+def _check_prediction(detector, moves, leads):
+    if not detector.doomed:
+        raise snake_trap.TrapPredictionError(
+            'trapped after {} moves without a prediction!'.format(moves))
+    if moves > detector.trapped_by:
+        raise snake_trap.TrapPredictionError(
+            'trapped after {} moves, not by {} as predicted at move '
+            '{}!'.format(moves, detector.trapped_by, detector.doomed_at))
+    leads[(detector.trapped_by - detector.doomed_at,
+           moves - detector.doomed_at)] += 1
+
+def _run_chunk(job):
+    board_size, length, episodes, seed, max_moves, engine, check_traps = job
+    if engine == 'batch':
+        import numpy as np
+        import snake_batch
+        digest = hashlib.sha256(seed.encode('utf-8')).digest()
+        rng = np.random.default_rng(int.from_bytes(digest[:8], 'little'))
+        survived, censored = snake_batch.run_batch(board_size, length,
+                                                   episodes, rng, max_moves)
+        return(board_size, length, survived, censored, collections.Counter())
+    rng = random.Random(seed)
+    survived = collections.Counter()
+    censored = 0
+    leads = collections.Counter() if check_traps else None
+    for _ in range(episodes):
+        moves = run_episode(board_size, length, rng, max_moves, leads)
+        if moves is None:
+            censored += 1
+        else:
+            survived[moves] += 1
+    return(board_size, length, survived, censored,
+           leads if check_traps else collections.Counter())
+
+def simulate(board_sizes, lengths, episodes, seed=0, jobs=1,
+             chunk_episodes=1000, max_moves=1000000, engine='objects',
+             check_traps=False):
+    # Runs episodes random snakes for every (board size, length) pair and
+    # returns {(board_size, length): (Counter of moves survived, number of
+    # episodes cut off at max_moves, Counter of prediction leads)}. Chunk c
+    # of a configuration is seeded with '<seed>:<width>x<height>:<length>:
+    # <c>'. The leads (see run_episode) are only counted with check_traps,
+    # which needs the objects engine; a wrong prediction raises
+    # snake_trap.TrapPredictionError.
+    if check_traps and engine != 'objects':
+        raise ValueError('check_traps needs the objects engine!')
+    work = []
+    for board_size in board_sizes:
+        for length in lengths:
+            start_position(board_size, length)
+            for c, first in enumerate(range(0, episodes, chunk_episodes)):
+                n = min(chunk_episodes, episodes - first)
+                chunk_seed = '{}:{}x{}:{}:{}'.format(seed, board_size[0],
+                                                    board_size[1], length, c)
+                work.append((board_size, length, n, chunk_seed, max_moves,
+                             engine, check_traps))
+    results = {}
+    if jobs == 1:
+        chunks = map(_run_chunk, work)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+        chunks = executor.map(_run_chunk, work)
+    try:
+        for board_size, length, survived, censored, leads in chunks:
+            total, cut, total_leads = results.get(
+                (board_size, length),
+                (collections.Counter(), 0, collections.Counter()))
+            total.update(survived)
+            total_leads.update(leads)
+            results[(board_size, length)] = (total, cut + censored,
+                                             total_leads)
+    finally:
+        if jobs != 1:
+            executor.shutdown()
+    return(results)
+
+def _quantile(hist, q):
+    target = q * (sum(hist.values()) - 1)
+    seen = 0
+    for moves in sorted(hist):
+        seen += hist[moves]
+        if seen > target:
+            return(moves)
+    return(None)
+
+def _parse_board(text):
+    try:
+        width, height = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('board must look like 30x30')
+    return((width, height))
+
+def main():
+    parser = argparse.ArgumentParser(description=('Headless survival '
+                                     'statistics for the meandering snake.'))
+    parser.add_argument('--boards', type=_parse_board, nargs='+',
+                        default=[(30, 30)],
+                        help='Board sizes, e.g. 30x30 20x40')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[16],
+                        help='Snake body lengths')
+    parser.add_argument('-n', '--episodes', type=int, default=10000,
+                        help='Episodes per board size and length')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Worker processes, 0 for one per CPU')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Master seed')
+    parser.add_argument('--chunk', type=int, default=1000,
+                        help='Episodes per unit of work')
+    parser.add_argument('--max-moves', type=int, default=1000000,
+                        help='Stop an episode after this many moves')
+    parser.add_argument('--engine', choices=('objects', 'batch'),
+                        default='objects',
+                        help=('objects: one Snake per episode; batch: '
+                              'vectorized NumPy snakes'))
+    parser.add_argument('--check-traps', action='store_true',
+                        help=('Follow each snake with the trap detector, '
+                              'check its prediction when the snake is '
+                              'trapped and report how many moves ahead it '
+                              'came; slower, same histograms (objects '
+                              'engine only)'))
+    parser.add_argument('-o', '--output', default=None,
+                        help=('Write the histograms as CSV (board_width, '
+                              'board_height, length, moves, count) here'))
+    parser.add_argument('--leads-output', default=None,
+                        help=('With --check-traps, write the prediction '
+                              'leads as CSV (board_width, board_height, '
+                              'length, predicted_lead, actual_lead, count) '
+                              'here'))
+    args = parser.parse_args()
+    if args.check_traps and args.engine != 'objects':
+        parser.error('--check-traps needs --engine objects')
+    if args.leads_output is not None and not args.check_traps:
+        parser.error('--leads-output needs --check-traps')
+    for board_size in args.boards:
+        for length in args.lengths:
+            try:
+                start_position(board_size, length)
+            except ValueError as e:
+                parser.error(str(e))
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    results = simulate(args.boards, args.lengths, args.episodes,
+                       seed=args.seed, jobs=jobs, chunk_episodes=args.chunk,
+                       max_moves=args.max_moves, engine=args.engine,
+                       check_traps=args.check_traps)
+    print('{:>9} {:>6} {:>10} {:>9} {:>7} {:>7} {:>7} {:>9}'.format(
+          'board', 'length', 'episodes', 'mean', 'p10', 'p50', 'p90',
+          'censored'), file=sys.stderr)
+    for (board_size, length), (hist, censored, _) in sorted(results.items()):
+        n = sum(hist.values())
+        mean = sum(m * c for m, c in hist.items()) / n if n else float('nan')
+        print('{:>9} {:>6} {:>10} {:>9.1f} {:>7} {:>7} {:>7} {:>9}'.format(
+              '{}x{}'.format(*board_size), length, n + censored, mean,
+              _quantile(hist, 0.1), _quantile(hist, 0.5),
+              _quantile(hist, 0.9), censored), file=sys.stderr)
+    if args.output is not None:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['board_width', 'board_height', 'length',
+                             'moves', 'count'])
+            for (board_size, length), (hist, _, _) in sorted(results.items()):
+                for moves in sorted(hist):
+                    writer.writerow([board_size[0], board_size[1], length,
+                                     moves, hist[moves]])
+    if args.check_traps:
+        # predicted: moves from doomed_at to trapped_by; actual: moves from
+        # doomed_at to the real trap. exact counts the episodes where the
+        # two agree.
+        print('\n{:>9} {:>6} {:>10} {:>9} {:>9} {:>7} {:>7}'.format(
+              'board', 'length', 'trapped', 'predicted', 'actual', 'max',
+              'exact'), file=sys.stderr)
+        for (board_size, length), (_, _, leads) in sorted(results.items()):
+            n = sum(leads.values())
+            if n == 0:
+                continue
+            predicted = sum(p * c for (p, _), c in leads.items()) / n
+            actual = sum(a * c for (_, a), c in leads.items()) / n
+            exact = sum(c for (p, a), c in leads.items() if p == a)
+            print('{:>9} {:>6} {:>10} {:>9.1f} {:>9.1f} {:>7} {:>6.1%}'
+                  .format('{}x{}'.format(*board_size), length, n, predicted,
+                          actual, max(a for _, a in leads), exact / n),
+                  file=sys.stderr)
+    if args.leads_output is not None:
+        with open(args.leads_output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['board_width', 'board_height', 'length',
+                             'predicted_lead', 'actual_lead', 'count'])
+            for (board_size, length), (_, _, leads) in sorted(results.items()):
+                for predicted, actual in sorted(leads):
+                    writer.writerow([board_size[0], board_size[1], length,
+                                     predicted, actual,
+                                     leads[(predicted, actual)]])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Per-tick timing for meandering_snake.py.
+#
+# A TickTimer splits each tick of update_canvas into phases (moving the
+# snakes, updating the trap detectors with --early-warning, updating their
+# renderers, drawing) with time.perf_counter, keeps one record per tick,
+# and summarizes the recent ticks for the on-canvas overlay. The app only
+# calls it when timing is switched on, so it costs nothing otherwise.
+# Records can be written as CSV or JSON.
+import collections
+import csv
+import json
+import time
+
+class TickTimer:
+    PHASES = ('move', 'detect', 'render', 'draw')
+    FIELDS = ('tick', 'start_s', 'move_ms', 'detect_ms', 'render_ms',
+              'draw_ms', 'total_ms', 'delay_ms', 'moved')
+
+    def __init__(self, window=20):
+        self.records = []
+        # Start times of the last few ticks, for the tick rate.
+        self._recent = collections.deque(maxlen=window)
+        self._origin = None
+        self._start = None
+        self._last = None
+        self._phases = None
+
+    def start(self):
+        now = time.perf_counter()
+        if self._origin is None:
+            self._origin = now
+        self._start = self._last = now
+        self._phases = {}
+        self._recent.append(now)
+
+    def mark(self, phase):
+        # Ends phase, which began at the previous start() or mark().
+        now = time.perf_counter()
+        self._phases[phase] = self._phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def elapsed_ms(self):
+        return((time.perf_counter() - self._start) * 1000)
+
+    def finish(self, delay_ms, moved):
+        record = {'tick': len(self.records),
+                  'start_s': self._start - self._origin}
+        for phase in self.PHASES:
+            record[phase + '_ms'] = self._phases.get(phase, 0.0) * 1000
+        record['total_ms'] = (self._last - self._start) * 1000
+        record['delay_ms'] = delay_ms
+        record['moved'] = moved
+        self.records.append(record)
+        return(record)
+
+    def tick_rate(self):
+        # Ticks per second over the recent window.
+        if len(self._recent) < 2:
+            return(0.0)
+        span = self._recent[-1] - self._recent[0]
+        return((len(self._recent) - 1) / span if span > 0 else 0.0)
+
+    def overlay_text(self):
+        if not self.records:
+            return('')
+        recent = self.records[-self._recent.maxlen:]
+        means = {key: sum(r[key] for r in recent) / len(recent)
+                 for key in ('move_ms', 'detect_ms', 'render_ms', 'draw_ms',
+                             'total_ms')}
+        return('{:.1f} ticks/s  tick {:.1f} ms\n'
+               'move {:.1f}  detect {:.1f}  render {:.1f}  draw {:.1f} ms'
+               .format(self.tick_rate(), means['total_ms'], means['move_ms'],
+                       means['detect_ms'], means['render_ms'],
+                       means['draw_ms']))
+
+    def write(self, path):
+        # JSON if path ends in .json, CSV otherwise.
+        with open(path, 'w', newline='') as f:
+            if path.lower().endswith('.json'):
+                json.dump({'ticks': self.records}, f, indent=2)
+            else:
+                writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+                writer.writeheader()
+                writer.writerows(self.records)
@@ -0,0 +1,239 @@
+# Early trap detection for snake_classes.Snake.
+#
+# A snake is certainly trapped once its head is sealed into a free region
+# too small to last until the body opens a way out. If the free cells
+# reachable from the head number R, the snake can make at most R more
+# moves inside them. The only other cells it could ever enter are body
+# cells bordering the region, and the body cell at index i (0 being the
+# neck) is only vacated after length - i more moves. So if no bordering
+# body cell is vacated within R moves, the snake will be trapped within R
+# moves, whatever it does.
+#
+# Checking this with a flood fill of the whole board every move costs
+# O(board). TrapDetector keeps it local:
+#
+# - The region can only shrink where the head moves in. If the new head
+#   cell is "simple" (its free 4-neighbours are connected through its 8
+#   surrounding cells), taking it cannot split the region, so the region
+#   is at most one cell smaller than before. The cells the tail frees only
+#   ever grow it.
+# - Only when the new head cell is not simple, or the region the head
+#   last saw was small, is a flood fill run. A region of more than length
+#   cells always outlasts the body around it, so the fill stops at twice
+#   that: a region found that big needs no new fill for length moves.
+# - Body indices come from a dict of the move count at which each body
+#   cell was entered, updated with the new neck and the vacated tail.
+#
+# So most moves cost a few set lookups, and a fill costs O(length) rather
+# than O(board). Cells of other snakes on a shared snake_classes.Board are
+# treated as possibly vacated after one move, which keeps the prediction
+# sound, if more cautious, with several snakes.
+
+# The 8 cells around a cell, in order around it; the even ones share an
+# edge with it.
+_RING = ((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1))
+_NEIGHBOURS = ((0, 1), (0, -1), (-1, 0), (1, 0))
+
+def _is_simple(mask):
+    # True if the free cells among the edge-sharing ones in mask (bit k set
+    # if _RING[k] is free) are connected through the free cells of the
+    # ring, i.e. filling the middle cell splits nothing.
+    free = [bool(mask >> k & 1) for k in range(8)]
+    if all(free):
+        return(True)
+    start = free.index(False)
+    runs = 0
+    in_run = False
+    for k in range(1, 9):
+        j = (start + k) % 8
+        if free[j]:
+            if not in_run:
+                in_run = True
+                edge = False
+            edge = edge or j % 2 == 0
+        elif in_run:
+            runs += edge
+            in_run = False
+    return(runs <= 1)
+
+_SIMPLE = tuple(_is_simple(mask) for mask in range(256))
+
+class TrapPredictionError(Exception):
+    # A snake was trapped later than its TrapDetector predicted, or without
+    # a prediction at all.
+    pass
+
+class TrapDetector:
+    # Call update() once after every move of the snake (and after a reset).
+    # Once doomed is True it stays True: trapped_by is the move count by
+    # which the snake will have been trapped.
+    def __init__(self, snake, board_size, board=None):
+        self.snake = snake
+        self.board_size = board_size
+        self.board = board
+        self.doomed = False
+        self.trapped_by = None
+        self.doomed_at = None
+        # Work counters, to compare against a full flood fill per move.
+        self.updates = 0
+        self.fills = 0
+        self.cells_visited = 0
+        self._moves = None
+        self._tail = None
+        self._stamps = {}
+        self._known = None
+        self._regions = None
+        self.update()
+
+    def _blocked(self):
+        # Cells taken by a snake; the head is only in it on a Board.
+        if self.board is not None:
+            return(self.board._owner)
+        return(self.snake._occupied)
+
+    def _free(self, cell):
+        # Callers must treat the head as taken themselves.
+        x, y = cell
+        return(1 <= x <= self.board_size[0] and 1 <= y <= self.board_size[1]
+               and cell not in self._blocked())
+
+    def _simple(self, cell):
+        # True if filling cell cannot split the free region around it.
+        x, y = cell
+        width, height = self.board_size
+        blocked = self._blocked()
+        mask = 0
+        bit = 1
+        for dx, dy in _RING:
+            nx = x + dx
+            ny = y + dy
+            if (1 <= nx <= width and 1 <= ny <= height
+                    and (nx, ny) not in blocked):
+                mask |= bit
+            bit <<= 1
+        return(_SIMPLE[mask])
+
+    def _opens_in(self, cell):
+        # Moves until cell, which is not free, could be entered. None for
+        # the edge of the board.
+        stamp = self._stamps.get(cell)
+        if stamp is not None:
+            return(len(self.snake) - (self.snake.moves - stamp))
+        x, y = cell
+        if not (1 <= x <= self.board_size[0] and 1 <= y <= self.board_size[1]):
+            return(None)
+        # Another snake's cell.
+        return(1)
+
+    def _fill(self):
+        # Flood fills each free region next to the head, up to twice length
+        # cells each. Returns the size of the region each free neighbour of
+        # the head is in and, if the snake is certainly trapped, the most
+        # moves it can still make (otherwise None).
+        self.fills += 1
+        cap = 2 * len(self.snake)
+        width, height = self.board_size
+        blocked = self._blocked()
+        head = self.snake.head.position
+        parity = (head[0] + head[1]) % 2
+        # Region number of every cell reached, -1 for the head.
+        seen = {head: -1}
+        regions = []
+        capped = False
+        for dx, dy in _NEIGHBOURS:
+            start = (head[0] + dx, head[1] + dy)
+            if start in seen or not self._free(start):
+                continue
+            seen[start] = len(regions)
+            stack = [start]
+            cells = []
+            while stack and len(cells) < cap:
+                cell = stack.pop()
+                cells.append(cell)
+                x, y = cell
+                for ex, ey in _NEIGHBOURS:
+                    nxt = (x + ex, y + ey)
+                    if (nxt not in seen and 1 <= nxt[0] <= width
+                            and 1 <= nxt[1] <= height
+                            and nxt not in blocked):
+                        seen[nxt] = len(regions)
+                        stack.append(nxt)
+            self.cells_visited += len(cells)
+            regions.append(cells)
+            capped = capped or bool(stack) or len(cells) >= cap
+        sizes = [len(cells) for cells in regions]
+        longest = None if capped else 0
+        if self.board is not None:
+            # Another snake next to the head may move out of the way by the
+            # next tick, even if the head has no free cell next to it. Its
+            # own body only moves when the head does.
+            for dx, dy in _NEIGHBOURS:
+                owner = self.board._owner.get((head[0] + dx, head[1] + dy))
+                if owner is not None and owner is not self.snake:
+                    longest = None
+        for cells in regions:
+            if longest is None:
+                break
+            # The moves stay in this region until the snake enters a body
+            # cell next to it, which takes at least opens moves, and never
+            # more than length. The path alternates colors of a
+            # checkerboard, starting opposite the head, which bounds how
+            # long it can be.
+            same = sum((x + y) % 2 == parity for x, y in cells)
+            moves = min(2 * (len(cells) - same), 2 * same + 1)
+            if moves >= len(self.snake):
+                longest = None
+                break
+            opens = min((n for n in (self._opens_in((x + ex, y + ey))
+                                     for x, y in cells for ex, ey in _NEIGHBOURS
+                                     if (x + ex, y + ey) not in seen)
+                         if n is not None), default=float('inf'))
+            if opens <= moves:
+                longest = None
+            else:
+                longest = max(longest, moves)
+        regions = {}
+        for dx, dy in _NEIGHBOURS:
+            cell = (head[0] + dx, head[1] + dy)
+            if seen.get(cell, -1) >= 0:
+                regions[cell] = sizes[seen[cell]]
+        return(regions, longest)
+
+    def update(self):
+        snake = self.snake
+        self.updates += 1
+        if self._moves is not None and snake.moves == self._moves + 1:
+            if snake._body:
+                del self._stamps[self._tail]
+                self._stamps[snake._body[0]] = snake.moves
+        elif snake.moves != self._moves:
+            self._stamps = {p: snake.moves - i
+                            for i, p in enumerate(snake._body)}
+            self._known = None
+            self._regions = None
+            self.doomed = False
+            self.trapped_by = self.doomed_at = None
+        else:
+            return(self.doomed)
+        self._moves = snake.moves
+        self._tail = snake._body[-1] if snake._body else None
+        # Without a body the head can always turn back.
+        if self.doomed or not snake._body:
+            return(self.doomed)
+        head = snake.head.position
+        # A lower bound on the region the head just moved into: from the
+        # last fill if there was one, else carried over from the last move.
+        known = self._known
+        if self._regions is not None:
+            known = self._regions.get(head)
+        if (known is not None and known > len(snake) + 1
+                and self._simple(head)):
+            self._known = known - 1
+            self._regions = None
+            return(False)
+        self._regions, longest = self._fill()
+        if longest is not None:
+            self.doomed = True
+            self.doomed_at = snake.moves
+            self.trapped_by = snake.moves + longest
+        return(self.doomed)
@@ -0,0 +1,39 @@
+import pytest
+
+import snake_stats
+import snake_trap
+
+
+def test_check_traps_gives_the_same_histograms():
+    kwargs = dict(board_sizes=[(12, 12), (20, 10)], lengths=[6, 8],
+                  episodes=100, seed=7, chunk_episodes=40)
+    checked = snake_stats.simulate(check_traps=True, **kwargs)
+    normal = snake_stats.simulate(**kwargs)
+    assert checked.keys() == normal.keys()
+    for key, (hist, censored, leads) in checked.items():
+        assert (hist, censored) == normal[key][:2]
+        assert not normal[key][2]
+        assert sum(leads.values()) == sum(hist.values())
+        assert all(predicted >= actual >= 0 for predicted, actual in leads)
+
+
+def test_check_traps_keeps_censoring():
+    kwargs = dict(board_sizes=[(30, 30)], lengths=[16], episodes=200,
+                  seed=1, max_moves=40)
+    normal = snake_stats.simulate(**kwargs)
+    assert normal[((30, 30), 16)][1] > 0
+    checked = snake_stats.simulate(check_traps=True, **kwargs)
+    assert checked[((30, 30), 16)][:2] == normal[((30, 30), 16)][:2]
+
+
+def test_late_trap_is_a_prediction_error(monkeypatch):
+    update = snake_trap.TrapDetector.update
+
+    def too_early(self):
+        # Claim every trap the moment it is found.
+        if update(self) and self.trapped_by > self.doomed_at:
+            self.trapped_by = self.doomed_at
+        return(self.doomed)
+    monkeypatch.setattr(snake_trap.TrapDetector, 'update', too_early)
+    with pytest.raises(snake_trap.TrapPredictionError):
+        snake_stats.simulate([(12, 12)], [6], 50, seed=7, check_traps=True)
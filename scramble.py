@@ -1,41 +1,402 @@
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import io
+import itertools
+import mmap
+import operator
+import os
+import re
+import sys
 import random as r
 
+try:
+    import numpy as np
+except ImportError:
+    # Only needed for scramble_batch() and the --batch option.
+    np = None
+
+# Matches one whitespace-delimited word with at least two letters or digits,
+# capturing (leading punctuation + first letter, interior, last letter +
+# trailing punctuation). [^\W_] is a Unicode-aware letter-or-digit, and
+# (?:_|[^\w\s]) is anything that is neither that nor whitespace.
+_WORD = re.compile(r'(?<!\S)((?:_|[^\w\s])*[^\W_])(\S*)([^\W_](?:_|[^\w\s])*)(?!\S)')
+
+# Interiors up to this length are shuffled by picking a uniformly random
+# permutation from a precomputed table instead of calling r.shuffle, which
+# loops over the characters in Python.
+_TABLE_MAX = 8
+_PERMUTATIONS = {}
+
+def _permutation_table(n):
+    table = _PERMUTATIONS.get(n)
+    if table is None:
+        table = [operator.itemgetter(*p)
+                 for p in itertools.permutations(range(n))]
+        _PERMUTATIONS[n] = table
+    return(table)
+
+
+def _shuffle_interior(interior):
+    n = len(interior)
+    if n < 2:
+        return(interior)
+    if n <= _TABLE_MAX:
+        table = _PERMUTATIONS.get(n) or _permutation_table(n)
+        return(''.join(table[int(r.random() * len(table))](interior)))
+    chars = list(interior)
+    r.shuffle(chars)
+    return(''.join(chars))
+
+
+def _scramble_words(text):
+    # _WORD.split returns [gap, prefix, interior, suffix, gap, ...], so the
+    # interiors are every fourth piece starting at index 2.
+    pieces = _WORD.split(text)
+    pieces[2::4] = map(_shuffle_interior, pieces[2::4])
+    return(''.join(pieces))
+
+
+def scramble_word(w):
+    m = _WORD.fullmatch(w)
+    if m is None:
+        return(w)
+    prefix, interior, suffix = m.groups()
+    return(prefix + _shuffle_interior(interior) + suffix)
+
+
 def scramble_internal(sentence):
-    words = sentence.lower().split(' ')
-    new_words = []
-    for w in words:
-        if len(w) in (1, 2):
-            new_words.append(w)
+    return(_scramble_words(sentence.lower()))
+
+
+def scramble_text(text, lower=True):
+    # Unlike splitting on single spaces, every run of whitespace (including
+    # newlines) is kept exactly as it was.
+    if lower:
+        text = text.lower()
+    return(_scramble_words(text))
+
+
+# Byte-level lookup tables for _scramble_bytes(). Bytes >= 128 belong to
+# multi-byte UTF-8 characters and are neither whitespace nor alnum here.
+if np is not None:
+    _BYTE_SPACE = np.array([c < 128 and chr(c).isspace() for c in range(256)])
+    _BYTE_ALNUM = np.array([c < 128 and chr(c).isalnum() for c in range(256)])
+
+
+def _classify_code_points(buf):
+    # Returns boolean arrays marking which code points in buf are whitespace
+    # and which are letters or digits, using the same Unicode rules as \s
+    # and [^\W_] in _WORD. Only the distinct non-ASCII code points are
+    # classified in Python; ASCII goes through a lookup table.
+    ascii_chars = [chr(c) for c in range(128)]
+    space_table = np.array([c.isspace() for c in ascii_chars])
+    alnum_table = np.array([c.isalnum() for c in ascii_chars])
+    is_ascii = buf < 128
+    is_space = np.zeros(len(buf), dtype=bool)
+    is_alnum = np.zeros(len(buf), dtype=bool)
+    is_space[is_ascii] = space_table[buf[is_ascii]]
+    is_alnum[is_ascii] = alnum_table[buf[is_ascii]]
+    if not is_ascii.all():
+        others = ~is_ascii
+        codes, inverse = np.unique(buf[others], return_inverse=True)
+        chars = [chr(c) for c in codes.tolist()]
+        is_space[others] = np.array([c.isspace() for c in chars])[inverse]
+        is_alnum[others] = np.array([c.isalnum() for c in chars])[inverse]
+    return(is_space, is_alnum)
+
+
+def _find_interiors(is_space, is_alnum):
+    # Vectorized equivalent of _WORD: for every whitespace-delimited word,
+    # the interior runs from just after its first letter or digit to just
+    # before its last one. Returns the (starts, lengths) of the interiors.
+    word_start = ~is_space
+    word_start[1:] &= is_space[:-1]
+    word_id = np.cumsum(word_start)
+    alnum_pos = np.flatnonzero(is_alnum)
+    if len(alnum_pos) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return(empty, empty)
+    ids = word_id[alnum_pos]
+    new_word = np.empty(len(ids), dtype=bool)
+    new_word[0] = True
+    new_word[1:] = ids[1:] != ids[:-1]
+    last_in_word = np.empty(len(ids), dtype=bool)
+    last_in_word[-1] = True
+    last_in_word[:-1] = new_word[1:]
+    first = alnum_pos[new_word]
+    last = alnum_pos[last_in_word]
+    return(first + 1, last - first - 1)
+
+
+def _shuffle_groups(buf, starts, lens, rng):
+    # Shuffles buf[start:start + len] in place for every interior, one
+    # vectorized step per distinct interior length.
+    for k in np.unique(lens):
+        if k < 2:
             continue
-        w = list(w)
-        i = 0
-        while not w[i].isalnum():
-            i += 1
-        if i == 0:
-            prefix = w[i]
-            w = w[1:]
-        else:
-            prefix = w[:i + 1]
-            w = w[i + 1:]
-        i = len(w) - 1
-        while not w[i].isalnum():
-            i -= 1
-        if i == (len(w) - 1):
-            suffix = w[len(w) - 1]
-            w = w[:-1]
+        group = starts[lens == k][:, np.newaxis]
+        perm = np.argsort(rng.random((len(group), k)), axis=1)
+        buf[group + np.arange(k)] = buf[group + perm]
+
+
+def scramble_batch(sentences, lower=True, rng=None):
+    # Scrambles many sentences at once with NumPy. All sentences are laid
+    # out in one flat buffer of code points, word interiors are found with
+    # array operations instead of the regex, and the interiors are grouped
+    # by length so that each group is shuffled in a single step: argsort of
+    # a (words, length) matrix of uniform random numbers gives one uniformly
+    # random permutation per row, applied with fancy indexing.
+    if np is None:
+        raise ImportError('scramble_batch() requires numpy!')
+    if rng is None:
+        rng = np.random.default_rng()
+    if lower:
+        sentences = [s.lower() for s in sentences]
+    else:
+        sentences = list(sentences)
+    # A newline between sentences keeps words from running together; it is
+    # dropped again when the buffer is cut back into sentences.
+    text = '\n'.join(sentences)
+    buf = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'),
+                        dtype=np.uint32).copy()
+    starts, lens = _find_interiors(*_classify_code_points(buf))
+    _shuffle_groups(buf, starts, lens, rng)
+    text = buf.tobytes().decode('utf-32-le', 'surrogatepass')
+    new_sentences = []
+    start = 0
+    for s in sentences:
+        new_sentences.append(text[start:start + len(s)])
+        start += len(s) + 1
+    return(new_sentences)
+
+
+def _scramble_bytes(buf, rng, lower=True):
+    # Scrambles a writable uint8 array of UTF-8 text in place. Words are
+    # split on ASCII whitespace, which never occurs inside a multi-byte
+    # sequence. Pure-ASCII words are shuffled vectorized, byte by byte. The
+    # few words containing non-ASCII bytes are decoded and shuffled one
+    # character at a time with scramble_word() so that no multi-byte
+    # character is torn apart; a permutation of characters keeps the byte
+    # length, so they fit back in place. Only ASCII letters are lowercased.
+    # Such a word may still hold non-ASCII whitespace (e.g. a no-break
+    # space), so it goes through the same regex as scramble_text() and is
+    # split there exactly as the streaming path would split it.
+    if lower:
+        buf[(buf >= 65) & (buf <= 90)] += 32
+    is_space = _BYTE_SPACE[buf]
+    is_alnum = _BYTE_ALNUM[buf]
+    high = buf >= 128
+    slow_words = []
+    if high.any():
+        word_start = ~is_space
+        word_start[1:] &= is_space[:-1]
+        word_id = np.cumsum(word_start)
+        slow_ids = np.unique(word_id[high])
+        in_slow_word = np.isin(word_id, slow_ids) & ~is_space
+        is_alnum &= ~in_slow_word
+        word_end = ~is_space
+        word_end[:-1] &= is_space[1:]
+        starts = np.flatnonzero(word_start)
+        ends = np.flatnonzero(word_end) + 1
+        slow = np.isin(word_id[starts], slow_ids)
+        slow_words = zip(starts[slow].tolist(), ends[slow].tolist())
+    starts, lens = _find_interiors(is_space, is_alnum)
+    _shuffle_groups(buf, starts, lens, rng)
+    for start, end in slow_words:
+        w = buf[start:end].tobytes().decode('utf-8', 'surrogateescape')
+        w = _scramble_words(w).encode('utf-8', 'surrogateescape')
+        buf[start:end] = np.frombuffer(w, dtype=np.uint8)
+
+
+def scramble_mmap(in_path, out_path, lower=True, seed=None,
+                  window=1 << 20):
+    # Scrambles in_path into out_path without decoding it into Python
+    # strings. Both files are memory-mapped, and the input is processed in
+    # windows of about window bytes, each cut after its last whitespace
+    # byte. Every finished window is flushed and dropped from memory, so
+    # peak RSS depends on window, not on the size of the file.
+    if np is None:
+        raise ImportError('scramble_mmap() requires numpy!')
+    # Opening out_path truncates it, which would wipe the input first.
+    if os.path.exists(out_path) and os.path.samefile(in_path, out_path):
+        raise ValueError('scramble_mmap() can\'t write over its input!')
+    if seed is None:
+        seed = r.getrandbits(64)
+    size = os.path.getsize(in_path)
+    with open(in_path, 'rb') as fi, open(out_path, 'w+b') as fo:
+        fo.truncate(size)
+        if size == 0:
+            return
+        mi = mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ)
+        mo = mmap.mmap(fo.fileno(), size)
+        src = np.frombuffer(mi, dtype=np.uint8)
+        dst = np.frombuffer(mo, dtype=np.uint8)
+        try:
+            pos = 0
+            done = 0
+            i = 0
+            while pos < size:
+                # Look for the last whitespace one window at a time, so a
+                # long run without any is scanned only once.
+                scanned = pos
+                end = min(pos + window, size)
+                while end < size:
+                    spaces = np.flatnonzero(_BYTE_SPACE[src[scanned:end]])
+                    if len(spaces):
+                        end = scanned + spaces[-1] + 1
+                        break
+                    scanned = end
+                    end = min(end + window, size)
+                digest = hashlib.sha256(
+                        '{}:{}'.format(seed, i).encode('utf-8')).digest()
+                rng = np.random.default_rng(
+                        int.from_bytes(digest[:8], 'little'))
+                r.seed(digest)
+                dst[pos:end] = src[pos:end]
+                _scramble_bytes(dst[pos:end], rng, lower=lower)
+                # madvise and flush need page-aligned offsets, so release
+                # whole pages up to the start of the last partial one.
+                release = (end // mmap.PAGESIZE) * mmap.PAGESIZE
+                if release > done:
+                    mo.flush(done, release - done)
+                    if hasattr(mmap, 'MADV_DONTNEED'):
+                        mo.madvise(mmap.MADV_DONTNEED, done, release - done)
+                        mi.madvise(mmap.MADV_DONTNEED, done, release - done)
+                    done = release
+                pos = end
+                i += 1
+            mo.flush()
+        finally:
+            # The arrays export the mmaps' buffers, which must be released
+            # before the maps can be closed.
+            del src, dst
+            mo.close()
+            mi.close()
+
+
+def iter_chunks(f, chunk_size=1 << 16):
+    # Reads f in chunks of about chunk_size characters, each cut after the
+    # last newline (or, for a block with no newline, the last whitespace
+    # character) so that no word is split across chunks. Memory stays
+    # bounded by chunk_size plus the longest single word. The cuts depend
+    # only on the input and chunk_size, which keeps seeded output stable.
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1!')
+    carry = ''
+    while True:
+        block = f.read(chunk_size)
+        if not block:
+            break
+        block = carry + block
+        cut = block.rfind('\n') + 1
+        if cut == 0:
+            cut = len(block)
+            while cut > 0 and not block[cut - 1].isspace():
+                cut -= 1
+        if cut == 0:
+            carry = block
+            continue
+        carry = block[cut:]
+        yield block[:cut]
+    if carry:
+        yield carry
+
+
+def _scramble_chunk(job):
+    # Runs in a worker process (or inline when jobs == 1). Reseeding the
+    # random state per chunk makes the output depend only on the master
+    # seed and the chunk index, not on which worker got the chunk.
+    seed, text, lower, batch = job
+    if batch:
+        digest = hashlib.sha256(seed.encode('utf-8')).digest()
+        rng = np.random.default_rng(int.from_bytes(digest[:8], 'little'))
+        return(scramble_batch([text], lower=lower, rng=rng)[0])
+    r.seed(seed)
+    return(scramble_text(text, lower=lower))
+
+
+def scramble_stream(chunks, lower=True, seed=None, jobs=1, batch=False):
+    # Yields the scrambled chunks in input order. With jobs > 1 the chunks
+    # are scrambled in a process pool, keeping at most 2 * jobs chunks in
+    # flight so memory stays bounded. Given a seed, the output is the same
+    # for any number of jobs. batch=True uses scramble_batch() per chunk.
+    if seed is None and jobs == 1:
+        for chunk in chunks:
+            if batch:
+                yield scramble_batch([chunk], lower=lower)[0]
+            else:
+                yield scramble_text(chunk, lower=lower)
+        return
+    if seed is None:
+        seed = r.getrandbits(64)
+    work = (('{}:{}'.format(seed, i), chunk, lower, batch)
+            for i, chunk in enumerate(chunks))
+    if jobs == 1:
+        for job in work:
+            yield _scramble_chunk(job)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as ex:
+        pending = collections.deque()
+        for job in work:
+            pending.append(ex.submit(_scramble_chunk, job))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _open_input(path):
+    # newline='' keeps '\r\n' and friends untouched on the way through.
+    if path == '-':
+        return(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8',
+                                errors='surrogateescape', newline=''))
+    return(open(path, encoding='utf-8', errors='surrogateescape', newline=''))
+
+
+def _open_output(path):
+    if path is None or path == '-':
+        return(io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8',
+                                errors='surrogateescape', newline=''))
+    return(open(path, 'w', encoding='utf-8', errors='surrogateescape',
+                newline=''))
+
+
+def _iter_file_chunks(paths, chunk_size):
+    for path in paths:
+        f = _open_input(path)
+        try:
+            yield from iter_chunks(f, chunk_size)
+        finally:
+            # Closing (or collecting) a wrapper around stdin would close
+            # the process's stdin with it, so just let go of it.
+            if path == '-':
+                f.detach()
+            else:
+                f.close()
+
+
+def stream_files(paths, out_path=None, chunk_size=1 << 16, lower=True,
+                 seed=None, jobs=1, batch=False):
+    # Checked here too, before out_path is created or truncated.
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1!')
+    out = _open_output(out_path)
+    try:
+        for text in scramble_stream(_iter_file_chunks(paths, chunk_size),
+                                    lower=lower, seed=seed, jobs=jobs,
+                                    batch=batch):
+            out.write(text)
+    finally:
+        if out_path is None or out_path == '-':
+            out.flush()
+            out.detach()
         else:
-            suffix = w[i:]
-            w = w[:i]
-        prefix = ''.join(prefix)
-        suffix = ''.join(suffix)
-        r.shuffle(w)
-        w = ''.join(w)
-        new_words.append(prefix + w + suffix)
-    new_sentence = ' '.join(new_words)
-    return(new_sentence)
+            out.close()
 
 
-def main():
+def interactive():
     print()
     print('Internal Scrambler')
     print('------------------')
@@ -47,5 +408,53 @@ def main():
     print()
 
 
+def main():
+    parser = argparse.ArgumentParser(description=('Scrambles the inside '
+                                     'letters of every word. With no files, '
+                                     'asks for a sentence interactively.'))
+    parser.add_argument('files', nargs='*',
+                        help='Files to scramble, or - for stdin')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Write to this file instead of stdout')
+    parser.add_argument('--chunk-size', default=1 << 16, type=int,
+                        help='Number of characters read at a time')
+    parser.add_argument('--keep-case', action='store_true',
+                        help='Do not lowercase the text')
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+                        help=('Number of worker processes, 0 for one per '
+                              'CPU'))
+    parser.add_argument('--seed', default=None, type=int,
+                        help=('Seed for reproducible output, independent '
+                              'of --jobs'))
+    parser.add_argument('--batch', action='store_true',
+                        help=('Shuffle each chunk with the vectorized NumPy '
+                              'path (requires numpy)'))
+    parser.add_argument('--mmap', action='store_true',
+                        help=('Scramble one file into -o through memory '
+                              'maps, working on raw UTF-8 bytes (requires '
+                              'numpy, lowercases ASCII only)'))
+    args = parser.parse_args()
+    if not args.files:
+        interactive()
+        return
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be at least 1')
+    if args.mmap:
+        if len(args.files) != 1 or args.files[0] == '-':
+            parser.error('--mmap needs exactly one input file')
+        if args.output is None or args.output == '-':
+            parser.error('--mmap needs an output file given with -o')
+        if (os.path.exists(args.output)
+                and os.path.samefile(args.files[0], args.output)):
+            parser.error('--mmap can\'t write over its input file')
+        scramble_mmap(args.files[0], args.output, lower=not args.keep_case,
+                      seed=args.seed)
+        return
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    stream_files(args.files, out_path=args.output,
+                 chunk_size=args.chunk_size, lower=not args.keep_case,
+                 seed=args.seed, jobs=jobs, batch=args.batch)
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Throughput benchmark for the cipher paths in secure_comm_demo.py.
+#
+# Times the full four-pass exchange (Alice locks, Bob locks, Alice unlocks,
+# Bob unlocks) for every cipher engine across message sizes from a few
+# bytes to hundreds of MB, and reports MB/s, peak memory allocated during
+# one exchange, and whether Bob got the message back intact. Results can be
+# written as JSON to compare versions. Run 'python secure_comm_bench.py -h'
+# for the options.
+
+import argparse
+import io
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import secure_comm_demo as scd
+
+def legacy_crypt(bins, key):
+    # The original decimal-string implementation of crypt(), kept here as
+    # the baseline: every byte is a decimal int like 1110100, formatted as
+    # an 8 character string and XORed one character at a time.
+    output = [0 for i in range(len(bins))]
+    k = list('{:08}'.format(key))
+    for i in range(len(bins)):
+        a = list('{:08}'.format(bins[i]))
+        temp = ['x' for i in range(8)]
+        cnt = 0
+        for z in zip(a, k):
+            temp[cnt] = str(int(z[0] != z[1]))
+            cnt += 1
+        output[i] = int(''.join(temp))
+    return output
+
+def _bins_key(key):
+    return int('{0:b}'.format(key))
+
+def _exchange_legacy(msg, crypt):
+    bins = [int('{0:b}'.format(b)) for b in msg]
+    a_key = _bins_key(scd.A_KEY)
+    b_key = _bins_key(scd.B_KEY)
+    out = crypt(crypt(crypt(crypt(bins, a_key), b_key), a_key), b_key)
+    return bytes(int(str(b), 2) for b in out)
+
+def _exchange_stream(msg):
+    out = io.BytesIO()
+    scd.exchange_stream(io.BytesIO(msg), out, b'\x13\x57\x9b\xdf\x24',
+                        b'\x8a\x6c\x42')
+    return out.getbuffer()
+
+_SCHEDULE = scd.KeystreamCache()
+
+# Maps engine names to (function from message to Bob's result, largest
+# message size it is run on by default). The string-based paths cost
+# microseconds per byte, so they are capped unless --no-caps is given.
+ENGINES = {
+    'legacy-string': (lambda m: _exchange_legacy(m, legacy_crypt), 1 << 18),
+    'crypt-compat': (lambda m: _exchange_legacy(m, scd.crypt), 1 << 20),
+    'bytes-1': (lambda m: scd.exchange(m, scd.A_KEY, scd.B_KEY).decrypted,
+                None),
+    'bytes-multi': (lambda m: scd.exchange(m, b'\x13\x57\x9b\xdf\x24',
+                                           b'\x8a\x6c\x42').decrypted, None),
+    'keystream': (lambda m: scd.exchange(m, b'alice', b'bob',
+                                         _SCHEDULE).decrypted, None),
+    'stream': (_exchange_stream, None),
+}
+
+def bench(engine, size, min_time=0.2):
+    # Times one engine on one message size. Repeats the exchange until
+    # min_time seconds have passed and reports the fastest run, then does
+    # one more run under tracemalloc for the peak allocation.
+    func, _ = ENGINES[engine]
+    msg = os.urandom(size)
+    best = float('inf')
+    spent = 0.0
+    runs = 0
+    ok = True
+    while spent < min_time or runs == 0:
+        start = time.perf_counter()
+        result = func(msg)
+        elapsed = time.perf_counter() - start
+        ok = ok and result == msg
+        best = min(best, elapsed)
+        spent += elapsed
+        runs += 1
+    del result
+    tracemalloc.start()
+    func(msg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'engine': engine,
+        'size': size,
+        'runs': runs,
+        'seconds': best,
+        'mb_per_s': size / 1e6 / best if best > 0 else float('inf'),
+        'peak_alloc_bytes': peak,
+        'round_trip_ok': ok,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=('Benchmarks the cipher '
+                                     'paths of secure_comm_demo.py through '
+                                     'the full four-pass exchange.'))
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[5, 1 << 10, 1 << 20, 1 << 25, 1 << 28],
+                        help='Message sizes in bytes')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES),
+                        default=list(ENGINES), help='Engines to time')
+    parser.add_argument('--no-caps', action='store_true',
+                        help=('Run the string-based engines on every size, '
+                              'however slow'))
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='Seconds to spend repeating each measurement')
+    parser.add_argument('--json', default=None,
+                        help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    print('\n{:<15}{:>12}{:>8}{:>12}{:>14}{:>8}'.format(
+          'engine', 'bytes', 'runs', 'MB/s', 'peak alloc', 'ok'))
+    print('-' * 69)
+    for size in args.sizes:
+        for engine in args.engines:
+            cap = ENGINES[engine][1]
+            if cap is not None and size > cap and not args.no_caps:
+                continue
+            res = bench(engine, size, args.min_time)
+            results.append(res)
+            print('{:<15}{:>12}{:>8}{:>12.2f}{:>14}{:>8}'.format(
+                  engine, size, res['runs'], res['mb_per_s'],
+                  res['peak_alloc_bytes'],
+                  'yes' if res['round_trip_ok'] else 'NO'))
+    print()
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'results': results}, f, indent=2)
+    if not all(res['round_trip_ok'] for res in results):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
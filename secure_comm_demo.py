@@ -1,4 +1,12 @@
+import argparse
+import asyncio
+import collections
+import functools
+import hashlib
+import os
+import sys
 import textwrap as tw
+import time
 
 def print_intro():
     title = ('\nSecure Communication on Unsecured Lines Between Strangers\n'
@@ -50,28 +58,361 @@ def print_err(err_msg):
             print('       {}'.format(lines[i]))
     print()
 
-def msg_to_bin(msg):
-    # NOTE: because of custom use, there is no input validation and the
-    # argument, msg, is assumed to be a 5 character string with values
-    # in [A-Za-z].
+# xor_into() works through multi-byte keys in blocks of about this many
+# bytes, a size at which Python's big-integer XOR is fastest.
+XOR_BLOCK = 1 << 16
+
+@functools.lru_cache(maxsize=256)
+def _xor_table(k):
+    # Translation table that XORs every byte with k.
+    return bytes(b ^ k for b in range(256))
+
+def _as_key(key):
+    if isinstance(key, int):
+        key = bytes([key])
+    key = bytes(key)
+    if not key:
+        raise ValueError('key must not be empty!')
+    return key
+
+@functools.lru_cache(maxsize=32)
+def _keystream_int(key, block):
+    # key repeated to fill block bytes, as one little-endian integer.
+    return int.from_bytes(key * (block // len(key)), 'little')
+
+def xor_into(buf, key, offset=0):
+    # XORs a writable buffer (bytearray, memoryview of one, ...) with key in
+    # place, as if buf started offset bytes into a longer stream, so a file
+    # can be processed chunk by chunk with a multi-byte key staying in
+    # phase. key is an int in [0, 255] or a non-empty bytes-like object.
+    key = _as_key(key)
+    k = offset % len(key)
+    if k:
+        key = key[k:] + key[:k]
+    mv = memoryview(buf).cast('B')
+    n = len(mv)
+    if len(key) == 1:
+        mv[:] = mv.tobytes().translate(_xor_table(key[0]))
+        return
+    # Whole blocks must hold a whole number of keys to stay in phase.
+    block = max(XOR_BLOCK - XOR_BLOCK % len(key), len(key))
+    if n >= block:
+        ks = _keystream_int(key, block)
+    for i in range(0, n - n % block, block):
+        x = int.from_bytes(mv[i:i + block], 'little') ^ ks
+        mv[i:i + block] = x.to_bytes(block, 'little')
+    tail = n % block
+    if tail:
+        tail_ks = int.from_bytes(key * (tail // len(key) + 1), 'little')
+        tail_ks &= (1 << (8 * tail)) - 1
+        x = int.from_bytes(mv[n - tail:], 'little') ^ tail_ks
+        mv[n - tail:] = x.to_bytes(tail, 'little')
+
+def xor_bytes(data, key):
+    # Byte-oriented XOR cipher engine. data can be any bytes-like object
+    # (bytes, bytearray, memoryview, ...) of any length. key is either a
+    # single byte as an int in [0, 255] or a bytes-like key that is repeated
+    # to cover data. Nothing loops over bits or bytes in Python: a one-byte
+    # key is applied with a 256-entry translation table, and longer keys by
+    # XORing whole blocks as big integers.
+    key = _as_key(key)
+    if len(key) == 1:
+        if not isinstance(data, (bytes, bytearray)):
+            data = memoryview(data).cast('B').tobytes()
+        return bytes(data.translate(_xor_table(key[0])))
+    out = bytearray(memoryview(data).cast('B'))
+    xor_into(out, key)
+    return bytes(out)
+
+class KeystreamCache:
+    # Seeded keystream generator with an LRU-bounded cache of expanded key
+    # material. Instead of repeating a short key, each key seeds a
+    # keystream: block i is SHAKE-256(key || i) stretched to block_size
+    # bytes. Blocks are generated once and kept (together with their
+    # integer form, ready for XOR) until max_blocks newer blocks push them
+    # out, so repeated messages under the same key skip key expansion
+    # entirely. XOR is commutative for any keystream, so the three-pass
+    # exchange still works when both parties use one of these.
+
+    def __init__(self, max_blocks=256, block_size=XOR_BLOCK):
+        if max_blocks < 1:
+            raise ValueError('max_blocks must be at least 1!')
+        self.max_blocks = max_blocks
+        self.block_size = block_size
+        # Blocks and stats are keyed by a SHA-256 of the key, so no key is
+        # kept once its blocks are gone. A key's stats are dropped with its
+        # last cached block, which bounds them by max_blocks too.
+        self._blocks = collections.OrderedDict()
+        self._stats = {}
 
-    bins = [0 for i in range(5)]
-    for i in range(len(msg)):
-        bins[i] = int('{0:b}'.format(ord(msg[i])))
-    return bins
+    @staticmethod
+    def key_id(key):
+        # Short fingerprint naming a key in stats() without revealing it.
+        return hashlib.sha256(_as_key(key)).hexdigest()[:12]
+
+    def block(self, key, i):
+        # Returns (bytes, int) for keystream block i of key.
+        key = _as_key(key)
+        digest = hashlib.sha256(key).digest()
+        stats = self._stats.get(digest)
+        if stats is None:
+            stats = self._stats[digest] = {'hits': 0, 'misses': 0,
+                                           'blocks': 0}
+        entry = self._blocks.get((digest, i))
+        if entry is not None:
+            self._blocks.move_to_end((digest, i))
+            stats['hits'] += 1
+            return entry
+        stats['misses'] += 1
+        data = hashlib.shake_256(key + i.to_bytes(8, 'little')).digest(
+                self.block_size)
+        entry = (data, int.from_bytes(data, 'little'))
+        self._blocks[(digest, i)] = entry
+        stats['blocks'] += 1
+        if len(self._blocks) > self.max_blocks:
+            (old, _), _ = self._blocks.popitem(last=False)
+            old_stats = self._stats[old]
+            old_stats['blocks'] -= 1
+            if not old_stats['blocks']:
+                del self._stats[old]
+        return entry
+
+    def xor_into(self, buf, key, offset=0):
+        # Like xor_into(), but with this key's keystream.
+        key = _as_key(key)
+        mv = memoryview(buf).cast('B')
+        n = len(mv)
+        pos = 0
+        while pos < n:
+            i, start = divmod(offset + pos, self.block_size)
+            data, whole = self.block(key, i)
+            m = min(self.block_size - start, n - pos)
+            if m == self.block_size:
+                ks = whole
+            else:
+                ks = int.from_bytes(memoryview(data)[start:start + m],
+                                    'little')
+            x = int.from_bytes(mv[pos:pos + m], 'little') ^ ks
+            mv[pos:pos + m] = x.to_bytes(m, 'little')
+            pos += m
+
+    def xor(self, data, key):
+        # Like xor_bytes(), but with this key's keystream.
+        out = bytearray(memoryview(data).cast('B'))
+        self.xor_into(out, key)
+        return bytes(out)
+
+    def stats(self):
+        # Hit and miss counts and the number of cached blocks of every key
+        # that still has blocks in the cache, keyed by key_id().
+        return {digest.hex()[:12]: dict(st)
+                for digest, st in self._stats.items()}
+
+def bin_row(data, lead='     '):
+    # Formats bytes the way the demo displays them: 8 binary digits each.
+    return lead + ' '.join('{:08b}'.format(b) for b in data)
+
+def letter_row(msg, lead='     '):
+    return lead + ' '.join('{:>8}'.format(c) for c in msg)
+
+def msg_to_bin(msg):
+    # Kept for compatibility: returns each character's code point written
+    # in binary digits but stored as a decimal int, e.g. 't' -> 1110100.
+    return [int('{0:b}'.format(ord(c))) for c in msg]
 
 def crypt(bins, key):
-    output = [0 for i in range(len(bins))]
-    k = list('{:08}'.format(key))
-    for i in range(len(bins)):
-        a = list('{:08}'.format(bins[i]))
-        temp = ['x' for i in range(8)]
-        cnt = 0
-        for z in zip(a, k):
-            temp[cnt] = str(int(z[0] != z[1]))
-            cnt += 1
-        output[i] = int(''.join(temp))
-    return output
+    # Kept for compatibility with the msg_to_bin() format; the XOR itself
+    # is done by xor_bytes().
+    data = bytes(int(str(b), 2) for b in bins)
+    return [int('{0:b}'.format(b)) for b in xor_bytes(data, int(str(key), 2))]
+
+
+# The keys used by the interactive demo, and the default keys for --batch.
+A_KEY = 0b01110100
+B_KEY = 0b10101110
+
+ThreePass = collections.namedtuple('ThreePass', ['a_encrypt', 'ab_encrypt',
+                                                 'b_encrypt', 'decrypted'])
+
+def exchange(msg, a_key, b_key, schedule=None):
+    # Runs the whole three-pass exchange on msg (any bytes-like object) and
+    # returns every message that crosses the wire, plus what Bob ends with:
+    #   a_encrypt:  Alice locks msg with her key and sends it to Bob.
+    #   ab_encrypt: Bob adds his lock and sends it back to Alice.
+    #   b_encrypt:  Alice removes her lock and sends it to Bob again.
+    #   decrypted:  Bob removes his lock and reads msg.
+    # With a KeystreamCache as schedule, keys seed keystreams instead of
+    # being repeated.
+    xor = xor_bytes if schedule is None else schedule.xor
+    a_encrypt = xor(msg, a_key)
+    ab_encrypt = xor(a_encrypt, b_key)
+    b_encrypt = xor(ab_encrypt, a_key)
+    decrypted = xor(b_encrypt, b_key)
+    return ThreePass(a_encrypt, ab_encrypt, b_encrypt, decrypted)
+
+def run_batch(messages, a_key=A_KEY, b_key=B_KEY, schedule=None):
+    # Yields (message, ThreePass) for every message in an iterable of
+    # strings or bytes-like objects. Strings are encoded as UTF-8.
+    for msg in messages:
+        data = msg.encode('utf-8') if isinstance(msg, str) else msg
+        yield msg, exchange(data, a_key, b_key, schedule)
+
+def batch_file(in_file, out_file, a_key=A_KEY, b_key=B_KEY,
+               schedule=None):
+    # Sends every line of in_file through the exchange without prompting
+    # and writes one tab-separated line per message to out_file: the
+    # message, the three wire messages in hex and whether Bob got the
+    # message back intact. Returns (messages, bytes, failures).
+    count = 0
+    total = 0
+    failures = 0
+    lines = (l.rstrip('\r\n') for l in in_file)
+    for msg, passes in run_batch(lines, a_key, b_key, schedule):
+        ok = passes.decrypted == msg.encode('utf-8')
+        out_file.write('{}\t{}\t{}\t{}\t{}\n'.format(
+                       msg, passes.a_encrypt.hex(), passes.ab_encrypt.hex(),
+                       passes.b_encrypt.hex(), 'ok' if ok else 'FAILED'))
+        count += 1
+        total += len(passes.decrypted)
+        failures += not ok
+    return count, total, failures
+
+def exchange_stream(in_file, out_file, a_key=A_KEY, b_key=B_KEY,
+                    chunk_size=1 << 20, stage='decrypted', schedule=None):
+    # Streams a binary file through the exchange one chunk at a time, so
+    # files of any size go through all four passes in constant memory.
+    # Every chunk is read into the same buffer and each pass is applied in
+    # place; the full ciphertext is never held in memory. stage picks which
+    # field of ThreePass is written to out_file: 'a_encrypt' is what the
+    # post office sees first, 'decrypted' is what Bob ends up with. Returns
+    # the number of bytes processed.
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1!')
+    xor = xor_into if schedule is None else schedule.xor_into
+    passes = (a_key, b_key, a_key, b_key)
+    passes = passes[:ThreePass._fields.index(stage) + 1]
+    buf = bytearray(chunk_size)
+    mv = memoryview(buf)
+    offset = 0
+    while True:
+        n = in_file.readinto(buf)
+        if not n:
+            break
+        chunk = mv[:n]
+        for key in passes:
+            xor(chunk, key, offset)
+        out_file.write(chunk)
+        offset += n
+    return offset
+
+# Every frame on the wire is a 4-byte big-endian length followed by data.
+def _write_frame(writer, data):
+    writer.write(len(data).to_bytes(4, 'big'))
+    writer.write(data)
+
+async def _read_frame(reader):
+    n = int.from_bytes(await reader.readexactly(4), 'big')
+    return await reader.readexactly(n)
+
+async def _bob_handler(reader, writer, key_bytes):
+    # Bob's side of one connection. The connection is reused for as many
+    # sessions as Alice sends; every session gets a fresh key for Bob. After
+    # the three protocol messages Bob returns a SHA-256 of what he
+    # decrypted, which is not part of the protocol but lets Alice check it.
+    try:
+        while True:
+            try:
+                a_encrypt = await _read_frame(reader)
+            except asyncio.IncompleteReadError:
+                break
+            b_key = os.urandom(key_bytes)
+            _write_frame(writer, xor_bytes(a_encrypt, b_key))
+            await writer.drain()
+            b_encrypt = await _read_frame(reader)
+            decrypted = xor_bytes(b_encrypt, b_key)
+            _write_frame(writer, hashlib.sha256(decrypted).digest())
+            await writer.drain()
+    finally:
+        writer.close()
+
+async def _alice_worker(connect, sessions, latencies, size, key_bytes):
+    # One of Alice's connections, running sessions back to back until the
+    # shared sessions iterator runs out. Returns the number of failures.
+    reader, writer = await connect()
+    failures = 0
+    try:
+        for _ in sessions:
+            msg = os.urandom(size)
+            a_key = os.urandom(key_bytes)
+            start = time.perf_counter()
+            _write_frame(writer, xor_bytes(msg, a_key))
+            await writer.drain()
+            ab_encrypt = await _read_frame(reader)
+            _write_frame(writer, xor_bytes(ab_encrypt, a_key))
+            await writer.drain()
+            digest = await _read_frame(reader)
+            latencies.append(time.perf_counter() - start)
+            failures += digest != hashlib.sha256(msg).digest()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return failures
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[round(p / 100 * (len(sorted_values) - 1))]
+
+async def simulate_sessions(sessions=10000, concurrency=100, size=64,
+                            key_bytes=1, unix_path=None):
+    # Runs many concurrent three-pass sessions between an Alice client and a
+    # Bob server on this machine, over TCP on 127.0.0.1 or a Unix socket at
+    # unix_path. Alice opens concurrency connections and reuses each one
+    # for many sessions, so at most concurrency sessions are in flight.
+    # Returns a dict of throughput and latency statistics.
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1!')
+    if key_bytes < 1:
+        raise ValueError('key_bytes must be at least 1!')
+    handler = functools.partial(_bob_handler, key_bytes=key_bytes)
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(handler, path=unix_path,
+                                                 backlog=concurrency)
+        connect = functools.partial(asyncio.open_unix_connection, unix_path)
+    else:
+        server = await asyncio.start_server(handler, '127.0.0.1', 0,
+                                            backlog=concurrency)
+        port = server.sockets[0].getsockname()[1]
+        connect = functools.partial(asyncio.open_connection, '127.0.0.1',
+                                    port)
+    latencies = []
+    shared = iter(range(sessions))
+    async with server:
+        start = time.perf_counter()
+        failures = await asyncio.gather(*(
+                _alice_worker(connect, shared, latencies, size, key_bytes)
+                for _ in range(min(concurrency, sessions))))
+        elapsed = time.perf_counter() - start
+    if unix_path is not None and os.path.exists(unix_path):
+        os.remove(unix_path)
+    latencies.sort()
+    return {
+        'sessions': len(latencies),
+        'failures': sum(failures),
+        'seconds': elapsed,
+        'sessions_per_second': (len(latencies) / elapsed if elapsed > 0
+                                else float('inf')),
+        'latency_ms': {name: 1000 * _percentile(latencies, p)
+                       for name, p in (('p50', 50), ('p90', 90),
+                                       ('p99', 99), ('max', 100))},
+    }
+
+def parse_key(text):
+    # Keys on the command line are hex strings: '74' or 'deadbeef'.
+    key = bytes.fromhex(text)
+    if not key:
+        raise argparse.ArgumentTypeError('key must not be empty')
+    return key
 
 
 ############################################################################# 
@@ -79,145 +420,258 @@ def crypt(bins, key):
 ############################################################################# 
 
 
-# Print intro and prompt for 5 letter string, 'msg'
-
-print_intro()
-while True:
-    msg = input('\nPlease enter a 5 letter message: ')
-    if len(msg) != 5:
-        print_err('Your message was not 5 characters!\nPlease try again')
-        continue
-    if not msg.isalpha():
-        print_err('Your message must contain only '
-                + 'English letters!\nPlease try again.')
-        continue
-    break
-print()
-
-# Show Alice encrypting msg and sending to Bob
-
-print('='*90)
-print()
-print('Great! Alice will send "{}" to Bob!\n'.format(msg))
-print('Encrypting and decrypting has 2 steps:')
-print('     1) Convert the letters into binary numbers using Unicode[1].')
-print('     2) Encrypt/Decrypt the numbers with a key and XOR[2].\n')
-print('[1]: Unicode is just a universally agreed upon dictionary that')
-print('     allows everyone to convert symbols into numbers.')
-print('[2]: XOR is an operation for 1\'s and 0\'s.')
-print('     If you have 2 digits (either 1 or 0), x and y,')
-print('     x XOR y = 0 if they are the same (both 1 or 0) or')
-print('     x XOR y = 1 if they are not the same (1 and 0 or 0 and 1\n')
-print('So first Alice converts "{}" to binary!\n'.format(msg))
-print('     {:>8} {:>8} {:>8} {:>8} {:>8}'.format(msg[0], msg[1], msg[2],
-                                             msg[3], msg[4]))
-bins = msg_to_bin(msg)
-print('     {:08} {:08} {:08} {:08} {:08}\n'.format(bins[0], bins[1], bins[2],
-                                                  bins[3], bins[4]))
-
-print('Then, Alice uses XOR to encrypt the binary numbers with a key.\n')
-a_key = 1110100
-print('     Alice\'s Key: {:08}\n'.format(a_key))
-print('     {:08} {:08} {:08} {:08} {:08}'.format(bins[0], bins[1], bins[2],
-                                                  bins[3], bins[4]))
-print(' XOR {:08} {:08} {:08} {:08} {:08}'.format(a_key, a_key, a_key,
-                                                  a_key, a_key))
-print('-'*49)
-a_encrypt = crypt(bins, a_key)
-print('     {:08} {:08} {:08} {:08} {:08}\n'.format(a_encrypt[0], a_encrypt[1],
-                                                    a_encrypt[2], a_encrypt[3],
-                                                    a_encrypt[4]))
-print('Alice sends Bob that binary string. Totally scrambled!\n')
-input('Press Enter to continue...')
-
-# Show Bob encrypting A-encrypted msg and sending
-# AB-encrypted msg back to Alice
-
-print('\u008d\u008d')
-print('='*90)
-print()
-print('So Bob gets that message and thinks "Well, I have not a clue what this is.')
-print('But I\'m going to put my own encryption on and send it back!"')
-print('So Bob does another XOR encryption with his own key!\n')
-b_key = 10101110
-print('     Bob\'s Key: {:08}\n'.format(b_key))
-print('     {:08} {:08} {:08} {:08} {:08}'.format(a_encrypt[0], a_encrypt[1],
-                                                  a_encrypt[2], a_encrypt[3],
-                                                  a_encrypt[4]))
-print(' XOR {:08} {:08} {:08} {:08} {:08}'.format(b_key, b_key, b_key,
-                                                  b_key, b_key))
-print('-'*49)
-ab_encrypt = crypt(a_encrypt, b_key)
-print('     {:08} {:08} {:08} {:08} {:08}\n'.format(ab_encrypt[0], ab_encrypt[1],
-                                                    ab_encrypt[2], ab_encrypt[3],
-                                                    ab_encrypt[4]))
-print('Bob sends that binary string back to Alice. Still totally scrambled!\n')
-input('Press Enter to continue...')
-print('\u008d\u008d')
-print('='*90)
-print()
-
-# Show Alice decrypting AB-encrypted msg and sending
-# B-encrypted msg back to Bob
-
-print('Now, the rest is trivial. First, Alice decrypts the double-encrypted')
-print('message that Bob sent her[3].\n')
-print('[3]: XOR is a symmetric cipher, meaning that decryption uses the')
-print('     same key that encryption does, so here it is the same, exact process.\n')
-print('     Alice\'s Key: {:08}\n'.format(a_key))
-print('     {:08} {:08} {:08} {:08} {:08}'.format(ab_encrypt[0], ab_encrypt[1],
-                                                  ab_encrypt[2], ab_encrypt[3],
-                                                  ab_encrypt[4]))
-print(' XOR {:08} {:08} {:08} {:08} {:08}'.format(a_key, a_key, a_key,
-                                                  a_key, a_key))
-print('-'*49)
-b_encrypt = crypt(ab_encrypt, a_key)
-print('     {:08} {:08} {:08} {:08} {:08}\n'.format(b_encrypt[0], b_encrypt[1],
-                                                    b_encrypt[2], b_encrypt[3],
-                                                    b_encrypt[4]))
-input('Press Enter to continue...')
-print('\u008d\u008d')
-print('='*90)
-print()
-
-# Show Bob decrypting B-encrypted msg and getting original msg!
-
-print('Now, Alice\'s encryption is broken, but Bob\'s encryption')
-print('is still active. Alice sends the resulting message')
-print('back to Bob, who decrypts his own encryption.\n')
-print('     Bob\'s Key: {:08}\n'.format(b_key))
-print('     {:08} {:08} {:08} {:08} {:08}'.format(b_encrypt[0], b_encrypt[1],
-                                                  b_encrypt[2], b_encrypt[3],
-                                                  b_encrypt[4]))
-print(' XOR {:08} {:08} {:08} {:08} {:08}'.format(b_key, b_key, b_key,
-                                                  b_key, b_key))
-print('-'*49)
-msg_decrypted = crypt(b_encrypt, b_key)
-print('     {:08} {:08} {:08} {:08} {:08}\n'.format(msg_decrypted[0], msg_decrypted[1],
-                                                    msg_decrypted[2], msg_decrypted[3],
-                                                    msg_decrypted[4]))
-print('When we use Unicode to convert the last binary result back to text,')
-print('we get...\n')
-ltrs_decrypted = [chr(int(str(a), 2)) for a in msg_decrypted]
-print('     {:>8} {:>8} {:>8} {:>8} {:>8}'.format(ltrs_decrypted[0], ltrs_decrypted[1],
-                                                  ltrs_decrypted[2], ltrs_decrypted[3],
-                                                  ltrs_decrypted[4]))
-print('     {:08} {:08} {:08} {:08} {:08}\n'.format(msg_decrypted[0], msg_decrypted[1],
-                                                    msg_decrypted[2], msg_decrypted[3],
-                                                    msg_decrypted[4]))
-input('Press Enter to continue...')
-print('\u008d\u008d')
-print('='*90)
-print()
-
-# Closing message
-
-print('Now Bob has Alice\'s message! He can read it clearly and no one')
-print('could have stolen the message during travel. More importantly,')
-print('Alice and Bob never met, knew each other, or exchanged secrets over')
-print('an unsecured line of communication. Despite being total strangers,')
-print('Alice and Bob can communicate securely without knowing each other\'s')
-print('keys at all! Amazing! Obviously digital encryption in the real world')
-print('is enormously more sophisticated than a simple XOR cipher, but this')
-print('is still an interesting and easy to grasp beginning to the security')
-print('mentality. Thanks for reading!\n')
+def demo():
+    # The interactive walkthrough.
+
+    # Print intro and prompt for 5 letter string, 'msg'
+
+    print_intro()
+    while True:
+        msg = input('\nPlease enter a 5 letter message: ')
+        if len(msg) != 5:
+            print_err('Your message was not 5 characters!\nPlease try again')
+            continue
+        # Letters like 'é' are alpha too but don't fit in one ASCII byte.
+        if not (msg.isascii() and msg.isalpha()):
+            print_err('Your message must contain only '
+                    + 'English letters!\nPlease try again.')
+            continue
+        break
+    print()
+
+    # Show Alice encrypting msg and sending to Bob
+
+    print('='*90)
+    print()
+    print('Great! Alice will send "{}" to Bob!\n'.format(msg))
+    print('Encrypting and decrypting has 2 steps:')
+    print('     1) Convert the letters into binary numbers using Unicode[1].')
+    print('     2) Encrypt/Decrypt the numbers with a key and XOR[2].\n')
+    print('[1]: Unicode is just a universally agreed upon dictionary that')
+    print('     allows everyone to convert symbols into numbers.')
+    print('[2]: XOR is an operation for 1\'s and 0\'s.')
+    print('     If you have 2 digits (either 1 or 0), x and y,')
+    print('     x XOR y = 0 if they are the same (both 1 or 0) or')
+    print('     x XOR y = 1 if they are not the same (1 and 0 or 0 and 1\n')
+    print('So first Alice converts "{}" to binary!\n'.format(msg))
+    print(letter_row(msg))
+    bins = msg.encode('ascii')
+    passes = exchange(bins, A_KEY, B_KEY)
+    print(bin_row(bins) + '\n')
+
+    print('Then, Alice uses XOR to encrypt the binary numbers with a key.\n')
+    a_key = A_KEY
+    print('     Alice\'s Key: {:08b}\n'.format(a_key))
+    print(bin_row(bins))
+    print(bin_row([a_key] * len(bins), lead=' XOR '))
+    print('-'*49)
+    a_encrypt = passes.a_encrypt
+    print(bin_row(a_encrypt) + '\n')
+    print('Alice sends Bob that binary string. Totally scrambled!\n')
+    input('Press Enter to continue...')
+
+    # Show Bob encrypting A-encrypted msg and sending
+    # AB-encrypted msg back to Alice
+
+    print('\u008d\u008d')
+    print('='*90)
+    print()
+    print('So Bob gets that message and thinks "Well, I have not a clue what this is.')
+    print('But I\'m going to put my own encryption on and send it back!"')
+    print('So Bob does another XOR encryption with his own key!\n')
+    b_key = B_KEY
+    print('     Bob\'s Key: {:08b}\n'.format(b_key))
+    print(bin_row(a_encrypt))
+    print(bin_row([b_key] * len(bins), lead=' XOR '))
+    print('-'*49)
+    ab_encrypt = passes.ab_encrypt
+    print(bin_row(ab_encrypt) + '\n')
+    print('Bob sends that binary string back to Alice. Still totally scrambled!\n')
+    input('Press Enter to continue...')
+    print('\u008d\u008d')
+    print('='*90)
+    print()
+
+    # Show Alice decrypting AB-encrypted msg and sending
+    # B-encrypted msg back to Bob
+
+    print('Now, the rest is trivial. First, Alice decrypts the double-encrypted')
+    print('message that Bob sent her[3].\n')
+    print('[3]: XOR is a symmetric cipher, meaning that decryption uses the')
+    print('     same key that encryption does, so here it is the same, exact process.\n')
+    print('     Alice\'s Key: {:08b}\n'.format(a_key))
+    print(bin_row(ab_encrypt))
+    print(bin_row([a_key] * len(bins), lead=' XOR '))
+    print('-'*49)
+    b_encrypt = passes.b_encrypt
+    print(bin_row(b_encrypt) + '\n')
+    input('Press Enter to continue...')
+    print('\u008d\u008d')
+    print('='*90)
+    print()
+
+    # Show Bob decrypting B-encrypted msg and getting original msg!
+
+    print('Now, Alice\'s encryption is broken, but Bob\'s encryption')
+    print('is still active. Alice sends the resulting message')
+    print('back to Bob, who decrypts his own encryption.\n')
+    print('     Bob\'s Key: {:08b}\n'.format(b_key))
+    print(bin_row(b_encrypt))
+    print(bin_row([b_key] * len(bins), lead=' XOR '))
+    print('-'*49)
+    msg_decrypted = passes.decrypted
+    print(bin_row(msg_decrypted) + '\n')
+    print('When we use Unicode to convert the last binary result back to text,')
+    print('we get...\n')
+    ltrs_decrypted = msg_decrypted.decode('ascii')
+    print(letter_row(ltrs_decrypted))
+    print(bin_row(msg_decrypted) + '\n')
+    input('Press Enter to continue...')
+    print('\u008d\u008d')
+    print('='*90)
+    print()
+
+    # Closing message
+
+    print('Now Bob has Alice\'s message! He can read it clearly and no one')
+    print('could have stolen the message during travel. More importantly,')
+    print('Alice and Bob never met, knew each other, or exchanged secrets over')
+    print('an unsecured line of communication. Despite being total strangers,')
+    print('Alice and Bob can communicate securely without knowing each other\'s')
+    print('keys at all! Amazing! Obviously digital encryption in the real world')
+    print('is enormously more sophisticated than a simple XOR cipher, but this')
+    print('is still an interesting and easy to grasp beginning to the security')
+    print('mentality. Thanks for reading!\n')
+
+
+def _make_schedule(args):
+    if not args.keystream:
+        return None
+    return KeystreamCache(max_blocks=args.cache_blocks)
+
+def _print_schedule_stats(schedule):
+    if schedule is None:
+        return
+    for kid, st in schedule.stats().items():
+        print('keystream {}: {} hits, {} misses, {} blocks cached'.format(
+              kid, st['hits'], st['misses'], st['blocks']), file=sys.stderr)
+
+def _batch_cli(args):
+    schedule = _make_schedule(args)
+    in_file = sys.stdin if args.batch == '-' else open(args.batch,
+                                                        encoding='utf-8')
+    out_file = sys.stdout if args.output == '-' else open(args.output, 'w',
+                                                          encoding='utf-8')
+    try:
+        start = time.perf_counter()
+        count, total, failures = batch_file(in_file, out_file,
+                                            args.a_key, args.b_key,
+                                            schedule)
+        elapsed = time.perf_counter() - start
+    finally:
+        if in_file is not sys.stdin:
+            in_file.close()
+        if out_file is not sys.stdout:
+            out_file.close()
+    print('{} messages, {} bytes, {} failed, {:.3f} s ({:.0f} msg/s)'.format(
+          count, total, failures, elapsed,
+          count / elapsed if elapsed > 0 else float('inf')), file=sys.stderr)
+    _print_schedule_stats(schedule)
+    if failures:
+        raise SystemExit(1)
+
+def _stream_cli(args):
+    schedule = _make_schedule(args)
+    in_file = (sys.stdin.buffer if args.stream == '-'
+               else open(args.stream, 'rb'))
+    out_file = (sys.stdout.buffer if args.output == '-'
+                else open(args.output, 'wb'))
+    try:
+        start = time.perf_counter()
+        total = exchange_stream(in_file, out_file, args.a_key, args.b_key,
+                                chunk_size=args.chunk_size, stage=args.stage,
+                                schedule=schedule)
+        out_file.flush()
+        elapsed = time.perf_counter() - start
+    finally:
+        if in_file is not sys.stdin.buffer:
+            in_file.close()
+        if out_file is not sys.stdout.buffer:
+            out_file.close()
+    print('{} bytes through {} in {:.3f} s ({:.1f} MB/s)'.format(
+          total, args.stage, elapsed,
+          total / 1e6 / elapsed if elapsed > 0 else float('inf')),
+          file=sys.stderr)
+    _print_schedule_stats(schedule)
+
+def _simulate_cli(args):
+    stats = asyncio.run(simulate_sessions(
+            sessions=args.simulate, concurrency=args.concurrency,
+            size=args.size, key_bytes=args.key_bytes,
+            unix_path=args.unix))
+    print('{} sessions, {} failed, {:.3f} s ({:.0f} sessions/s)'.format(
+          stats['sessions'], stats['failures'], stats['seconds'],
+          stats['sessions_per_second']))
+    print('latency ms: ' + ', '.join('{} {:.2f}'.format(k, v)
+                                     for k, v in stats['latency_ms'].items()))
+    if stats['failures']:
+        raise SystemExit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description=('Educational demo of '
+                                     'secure communication between '
+                                     'strangers. With no arguments, runs the '
+                                     'interactive walkthrough.'))
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--batch', metavar='FILE', default=None,
+                      help=('Send every line of FILE (- for stdin) '
+                            'through the exchange without prompting'))
+    mode.add_argument('--stream', metavar='FILE', default=None,
+                      help=('Send the whole of FILE (- for stdin) through '
+                            'the exchange in chunks'))
+    mode.add_argument('--simulate', metavar='N', type=int, default=None,
+                      help=('Run N concurrent sessions between Alice and '
+                            'Bob over local sockets'))
+    parser.add_argument('-o', '--output', default='-',
+                        help='Where to write --batch or --stream results')
+    parser.add_argument('--a-key', type=parse_key, default=bytes([A_KEY]),
+                        help='Alice\'s key in hex')
+    parser.add_argument('--b-key', type=parse_key, default=bytes([B_KEY]),
+                        help='Bob\'s key in hex')
+    parser.add_argument('--chunk-size', type=int, default=1 << 20,
+                        help='Bytes read at a time by --stream')
+    parser.add_argument('--stage', choices=ThreePass._fields,
+                        default='decrypted',
+                        help='Which pass --stream writes out')
+    parser.add_argument('--keystream', action='store_true',
+                        help=('Use the keys to seed cached keystreams '
+                              'instead of repeating them (--batch, '
+                              '--stream)'))
+    parser.add_argument('--cache-blocks', type=int, default=256,
+                        help=('Keystream blocks of 64 KiB kept in the '
+                              'cache for --keystream'))
+    parser.add_argument('--concurrency', type=int, default=100,
+                        help='Connections (and sessions in flight) for '
+                             '--simulate')
+    parser.add_argument('--size', type=int, default=64,
+                        help='Message size in bytes for --simulate')
+    parser.add_argument('--key-bytes', type=int, default=1,
+                        help='Length of the random per-session keys for '
+                             '--simulate')
+    parser.add_argument('--unix', metavar='PATH', default=None,
+                        help='Use a Unix socket at PATH for --simulate '
+                             'instead of TCP')
+    args = parser.parse_args()
+    if args.stream is not None and args.chunk_size < 1:
+        parser.error('--chunk-size must be at least 1')
+    if args.batch is not None:
+        _batch_cli(args)
+    elif args.stream is not None:
+        _stream_cli(args)
+    elif args.simulate is not None:
+        _simulate_cli(args)
+    else:
+        demo()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import pytest
+
+import scramble
+
+np = pytest.importorskip('numpy')
+
+TEXT = ('The quick brown fox jumps over the lazy dog.\n'
+        'ça ne déménage pas: «naïveté» coûte très cher, señor!\n'
+        'abcdefghijklmnopqrstuvwxyz\u00a0zyxwvutsrqponmlkjihgfedcba\n'
+        '“quoted”   words\tand    gaps of\u00a0all kinds\n'
+        ) * 50
+
+
+def _canonical(text):
+    # Every word with its interior sorted, so any two valid scrambles of
+    # the same text compare equal.
+    return(scramble._WORD.sub(
+        lambda m: m[1] + ''.join(sorted(m[2])) + m[3], text))
+
+
+def test_mmap_matches_stream_on_multibyte_input(tmp_path):
+    src = tmp_path / 'in.txt'
+    src.write_text(TEXT, encoding='utf-8')
+    out_mmap = tmp_path / 'mmap.txt'
+    out_stream = tmp_path / 'stream.txt'
+    # A small window puts many cuts inside the text.
+    scramble.scramble_mmap(str(src), str(out_mmap), seed=1, window=97)
+    scramble.stream_files([str(src)], out_path=str(out_stream),
+                          chunk_size=97, seed=1)
+    mmapped = out_mmap.read_text(encoding='utf-8')
+    streamed = out_stream.read_text(encoding='utf-8')
+    # All of TEXT's non-ASCII letters are lowercase already, so lowering
+    # only ASCII (as the mmap path does) gives the same text.
+    assert _canonical(mmapped) == _canonical(streamed) == _canonical(
+        TEXT.lower())
+    # Words joined by a no-break space are scrambled, not passed through.
+    long_word = 'abcdefghijklmnopqrstuvwxyz\u00a0zyxwvutsrqponmlkjihgfedcba'
+    assert long_word not in mmapped
+    assert long_word not in streamed
+
+
+def test_mmap_long_run_without_spaces(tmp_path):
+    src = tmp_path / 'in.txt'
+    src.write_bytes(b'x' * 5000 + b' ab ' + b'y' * 5000 + b'\n')
+    out = tmp_path / 'out.txt'
+    scramble.scramble_mmap(str(src), str(out), seed=1, window=64)
+    assert out.read_bytes() == src.read_bytes()
+
+
+def test_mmap_refuses_to_overwrite_input(tmp_path):
+    src = tmp_path / 'in.txt'
+    src.write_text(TEXT, encoding='utf-8')
+    with pytest.raises(ValueError):
+        scramble.scramble_mmap(str(src), str(src), seed=1)
+    assert src.read_text(encoding='utf-8') == TEXT